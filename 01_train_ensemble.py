@@ -1,13 +1,12 @@
-import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, VotingClassifier
 from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split
 import joblib
 
-df = pd.read_excel("dummy_claims_with_fraud_label.xlsx")
+from feature_matrix import load_frame
 
-X = df.drop(columns=["fraud_label"])
-y = df["fraud_label"]
+# matriks fitur float32 bersama (feature_cache/, memmap) — tanpa parse ulang CSV/XLSX
+X, y = load_frame()
 
 X_train, X_test, y_train, y_test = train_test_split(
     X, y, test_size=0.2, random_state=42, stratify=y
@@ -1,11 +1,12 @@
 import shap
 import joblib
-import pandas as pd
 import numpy as np
 
+from feature_matrix import load_frame
+
 model = joblib.load("model_ensemble.pkl")
-df = pd.read_excel("dummy_claims_with_fraud_label.xlsx")
-X = df.drop(columns=["fraud_label"])
+# matriks fitur float32 bersama (feature_cache/, memmap) — sama dengan saat training
+X, _ = load_frame()
 
 explainer = shap.TreeExplainer(model.estimators_[0])  # pakai RF
 shap_values = explainer.shap_values(X)
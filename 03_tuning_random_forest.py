@@ -1,12 +1,11 @@
 from sklearn.model_selection import RandomizedSearchCV
 from sklearn.ensemble import RandomForestClassifier
-import pandas as pd
 import joblib
 
-df = pd.read_excel("dummy_claims_with_fraud_label.xlsx")
+from feature_matrix import load_frame
 
-X = df.drop(columns=["fraud_label"])
-y = df["fraud_label"]
+# matriks fitur float32 bersama (feature_cache/, memmap) — tanpa parse ulang CSV/XLSX
+X, y = load_frame()
 
 param_grid = {
     "n_estimators": [200, 300, 400, 500],
@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+#   BENCHMARK TRAINING RANDOM FOREST (worker × ukuran data)
+# ==========================================================
+# Data: hasil SMOTE dari data training classification_RF.py, di-resample
+# (dengan pengembalian, seed tetap) ke tiap ukuran. Setiap konfigurasi jalan
+# di subprocess baru supaya peak memori tidak tercampur run sebelumnya;
+# peak = RSS proses + semua turunannya (worker loky), disampel tiap 20 ms.
+#
+# Contoh:
+#   python benchmark_rf.py
+#   python benchmark_rf.py --sizes 20000,100000 --workers 1,2,4 --backend processes
+
+BENCHMARK_FILE = "rf_benchmark.csv"
+DEFAULT_SIZES = "10000,50000,200000"
+DEFAULT_WORKERS = "1,2,4,8,16,32"
+SAMPLE_SECONDS = 0.02
+
+
+# ============ MEMORI ============
+def _rss(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def _children(pid):
+    out = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            out += [int(c) for c in f.read().split()]
+    return out
+
+
+def tree_rss(pid):
+    # RSS proses + semua turunannya (proses yang sudah selesai diabaikan)
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            total += _rss(p)
+            stack += _children(p)
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class PeakMemory:
+    # thread sampler; tanpa /proc → ru_maxrss proses ini saja
+
+    def __init__(self, interval=SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._proc = os.path.exists(f"/proc/{os.getpid()}/task")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, tree_rss(os.getpid()))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self._proc:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._proc:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, tree_rss(os.getpid()))
+        else:
+            import resource
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ============ SATU KONFIGURASI (subprocess) ============
+def run_single(data_dir, n_rows, workers, backend, trees=0):
+    from model_training import build_forest, fit_forest
+
+    X = np.load(os.path.join(data_dir, "X.npy"), mmap_mode="r")[:n_rows]
+    y = np.load(os.path.join(data_dir, "y.npy"), allow_pickle=True)[:n_rows]
+    X = np.ascontiguousarray(X)
+
+    base = tree_rss(os.getpid())
+    with PeakMemory() as mem:
+        start = time.perf_counter()
+        params = {'n_estimators': trees} if trees else {}
+        fit_forest(build_forest(workers, **params), X, y, backend)
+        elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'train_seconds': round(elapsed, 3),
+        'peak_mb': round(mem.peak / 2**20, 1),
+        'peak_over_data_mb': round((mem.peak - base) / 2**20, 1),
+    }))
+
+
+# ============ DATA ============
+def prepare_data(data_dir, max_rows):
+    from imblearn.over_sampling import SMOTE
+    from feature_matrix import load_frame
+
+    X, y = load_frame()
+    X_res, y_res = SMOTE(random_state=42).fit_resample(X, y)
+    rows = np.random.default_rng(42).choice(len(X_res), size=max_rows, replace=True)
+    np.save(os.path.join(data_dir, "X.npy"), X_res.to_numpy(dtype=np.float32)[rows])
+    np.save(os.path.join(data_dir, "y.npy"), np.asarray(y_res, dtype=object)[rows])
+    return len(X_res)
+
+
+def benchmark(sizes, workers, backend, trees=None):
+    results = []
+    with tempfile.TemporaryDirectory() as data_dir:
+        n_source = prepare_data(data_dir, max(sizes))
+        print(f"Data sumber (setelah SMOTE): {n_source} baris, {os.cpu_count()} core")
+        for n_rows in sizes:
+            for w in workers:
+                out = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--single",
+                     data_dir, str(n_rows), str(w), backend, str(trees or 0)],
+                    check=True, capture_output=True, text=True,
+                )
+                stats = json.loads(out.stdout.strip().splitlines()[-1])
+                results.append({'n_rows': n_rows, 'workers': w, 'backend': backend,
+                                'cores': os.cpu_count(), **stats})
+                print(f"  {n_rows:>8} baris × {w:>2} worker: "
+                      f"{stats['train_seconds']:.2f}s, peak {stats['peak_mb']:.0f} MB")
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--single":
+        data_dir, n_rows, workers, backend, trees = sys.argv[2:7]
+        run_single(data_dir, int(n_rows), int(workers), backend, int(trees))
+        sys.exit(0)
+
+    from model_training import BACKENDS
+
+    parser = argparse.ArgumentParser(description="Benchmark training RF: waktu & peak memori")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="jumlah baris training, dipisah koma")
+    parser.add_argument("--workers", default=DEFAULT_WORKERS, help="jumlah worker, dipisah koma")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="threads")
+    parser.add_argument("--trees", type=int, default=None, help="n_estimators (default: sama dengan model)")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    workers = [int(w) for w in args.workers.split(",")]
+
+    results = benchmark(sizes, workers, args.backend, args.trees)
+    base = results[results['workers'] == results['workers'].min()].set_index('n_rows')['train_seconds']
+    results['speedup'] = results['n_rows'].map(base) / results['train_seconds']
+    results.to_csv(BENCHMARK_FILE, index=False)
+
+    print("\n=== Waktu training (s) ===")
+    print(results.pivot(index='n_rows', columns='workers', values='train_seconds'))
+    print("\n=== Speedup vs worker minimum ===")
+    print(results.pivot(index='n_rows', columns='workers', values='speedup').round(2))
+    print("\n=== Peak memori (MB) ===")
+    print(results.pivot(index='n_rows', columns='workers', values='peak_mb'))
+    print(f"✔ {BENCHMARK_FILE} saved.")
@@ -1,52 +1,160 @@
+import argparse
+import os
+import time
+
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
-from imblearn.over_sampling import SMOTE
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
 from sklearn.preprocessing import StandardScaler
+import joblib
 
-df = pd.read_csv("dummy_claims_with_fraud_label.csv", dtype={"NIK": str})
-
-features = [
-    'age','NIK_valid','biometric_flag','num_diagnoses','num_procedures',
-    'length_of_stay','total_claim_amount','diagnosis_cost_ratio',
-    'avg_cost_per_procedure','verification_delay_days',
-    'duplicate_ID_count','duplicate_ID_count_month','time_between_admissions',
-    'num_claims_last_30d_by_provider','num_unique_patients_last_30d',
-    'provider_claim_rate_vs_peer','claim_rejection_rate_provider',
-    'month_over_month_claim_growth','sudden_spike_flag',
-    'avg_claim_per_patient','claim_fragmentation_score','service_mix_index'
-]
-
-X = df[features]
-y = df['fraud_label']
-
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
+from feature_engineering import FEATURES, parse_dates
+from label_state import HOLDOUT_FILE
+from feature_matrix import load_frame
+from model_training import (
+    MODEL_FILE, MODEL_FEATURES, RF_PARAMS, BACKENDS, ENGINES, DEFAULT_REBALANCE, build_model, fit_model,
+    grow_forest, training_workers, save_model_version, latest_version,
 )
+from rebalancing import STRATEGIES, rebalance
 
-# === SMOTE (oversample kelas HIGH)
-sm = SMOTE(random_state=42)
-X_train_res, y_train_res = sm.fit_resample(X_train, y_train)
+features = MODEL_FEATURES
+NEW_TREES = 50       # tree baru per batch (mode --incremental)
+REPLAY_ROWS = 200    # baris history per kelas yang tidak ada di batch baru
 
-# === Random Forest dengan class_weight
-model = RandomForestClassifier(
-    n_estimators=300,
-    max_depth=12,
-    class_weight={'HIGH': 4, 'MEDIUM': 1.5, 'NORMAL': 1},
-    random_state=42
-)
 
-model.fit(X_train_res, y_train_res)
-y_pred = model.predict(X_test)
-import joblib
+def train_full(X, y, n_jobs, backend, engine="rf", strategy=None):
+    # Train-test split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    # === Rebalancing (default: SMOTE untuk RF, class_weight native untuk HGB)
+    strategy = strategy or DEFAULT_REBALANCE[engine]
+    start = time.perf_counter()
+    X_train_res, y_train_res, class_weight = rebalance(X_train, y_train, strategy)
+    print(f"Rebalancing {strategy}: {len(X_train)} → {len(X_train_res)} baris, "
+          f"{time.perf_counter() - start:.2f}s")
+
+    # === Random Forest / HistGradientBoosting dengan class_weight
+    n_jobs = training_workers(n_jobs, len(X_train_res), len(features), backend)
+    model = build_model(engine, n_jobs)
+
+    start = time.perf_counter()
+    fit_model(model, X_train_res, y_train_res, n_jobs, backend, class_weight)
+    elapsed = time.perf_counter() - start
+    print(f"Training {engine}: {len(X_train_res)} baris, {n_jobs} worker ({backend}), {elapsed:.2f}s")
+
+    version, path = save_model_version(model, "full", len(X_train_res), len(X), elapsed)
+    return model, X_test, y_test, version, path
+
+
+# ==========================================================
+#   MODE INKREMENTAL: forest lama + tree baru dari batch baru
+# ==========================================================
+# Batch baru = baris training setelah n_training_rows versi terakhir
+# (klaim yang di-append fraud_label.py --incremental), atau --recent N baris
+# terakhir. Waktu training ~ ukuran batch × jumlah tree baru.
+
+def replay_missing_classes(X, y, X_new, y_new, classes):
+    # kelas yang tidak muncul di batch baru diambil sebagian dari history
+    parts_X, parts_y = [X_new], [y_new]
+    rng = np.random.default_rng(42)
+    for label in sorted(set(classes) - set(y_new.unique())):
+        rows = np.flatnonzero((y == label).to_numpy())
+        rows = rng.choice(rows, size=min(REPLAY_ROWS, len(rows)), replace=False)
+        parts_X.append(X.iloc[rows])
+        parts_y.append(y.iloc[rows])
+    return pd.concat(parts_X), pd.concat(parts_y)
+
+
+def train_incremental(X, y, prev, n_new, retire, recent, n_jobs, backend, strategy=None):
+    n_prev = int(prev['n_training_rows'])
+    X_new, y_new = (X.iloc[-recent:], y.iloc[-recent:]) if recent else (X.iloc[n_prev:], y.iloc[n_prev:])
+    if len(X_new) == 0:
+        print("Tidak ada baris training baru sejak versi terakhir.")
+        return None
+
+    model = joblib.load(prev['file'])
+    X_new, y_new = replay_missing_classes(X, y, X_new, y_new, model.classes_)
+    X_res, y_res, class_weight = rebalance(X_new, y_new, strategy or DEFAULT_REBALANCE["rf"])
+    if class_weight is not None:
+        model.set_params(class_weight=class_weight)   # hanya berlaku untuk tree baru
+
+    n_jobs = training_workers(n_jobs, len(X_res), len(features), backend)
+    model.set_params(n_jobs=n_jobs)
+    start = time.perf_counter()
+    seed = RF_PARAMS['random_state'] + int(prev['version']) + 1   # seed per versi baru
+    grow_forest(model, X_res, y_res, n_new, retire, backend, seed)
+    elapsed = time.perf_counter() - start
+    print(f"Incremental: +{n_new} tree, -{retire} tree lama, {len(X_res)} baris batch, "
+          f"{n_jobs} worker ({backend}), {elapsed:.2f}s → {len(model.estimators_)} tree")
+
+    version, path = save_model_version(
+        model, "incremental", len(X_res), len(X), elapsed, parent=int(prev['version'])
+    )
+    return model, version, path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Training model fraud (RandomForest / HistGradientBoosting)")
+    parser.add_argument(
+        "--n-jobs", type=int, default=-1,
+        help="jumlah worker training (-1 = semua core, dibatasi memori tersedia)"
+    )
+    parser.add_argument("--backend", choices=list(BACKENDS), default="threads")
+    parser.add_argument(
+        "--engine", choices=ENGINES, default="rf",
+        help="rf: RandomForest + SMOTE; hgb: HistGradientBoosting (fitur di-bin) + class weight"
+    )
+    parser.add_argument(
+        "--rebalance", choices=STRATEGIES, default=None,
+        help="smote (exact) | smote_approx (tetangga aproksimasi) | undersample (NORMAL) | "
+             "class_weight (tanpa resampling) | none; default: smote untuk rf, none untuk hgb"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="tambah tree ke model versi terakhir dari batch baru (tanpa training ulang penuh)"
+    )
+    parser.add_argument("--new-trees", type=int, default=NEW_TREES)
+    parser.add_argument("--retire", type=int, default=0, help="jumlah tree tertua yang dibuang")
+    parser.add_argument("--recent", type=int, default=0,
+                        help="pakai N baris training terakhir sebagai batch baru")
+    args = parser.parse_args()
+
+    # matriks fitur float32 dari feature_cache/ (dibangun sekali per versi data)
+    X, y = load_frame(features)
+    prev = latest_version()
+
+    # warm start hanya untuk forest; HGB selalu training penuh
+    can_grow = (
+        args.engine == "rf" and prev is not None and os.path.exists(prev['file'])
+        and prev['engine'] != "hgb"
+    )
+    if args.incremental and can_grow:
+        result = train_incremental(
+            X, y, prev, args.new_trees, args.retire, args.recent, args.n_jobs, args.backend,
+            args.rebalance,
+        )
+        if result is None:
+            raise SystemExit(0)
+        model, version, path = result
+
+        # evaluasi pada klaim holdout (new_claims_30.csv)
+        holdout = FEATURES.ensure(parse_dates(pd.read_csv(HOLDOUT_FILE, dtype={"NIK": str})), features)
+        X_test, y_test = holdout[features], holdout['fraud_label']
+    else:
+        if args.incremental:
+            print("Belum ada versi model forest → training penuh.")
+        model, X_test, y_test, version, path = train_full(
+            X, y, args.n_jobs, args.backend, args.engine, args.rebalance
+        )
 
-joblib.dump(model, "fraud_model.pkl")
-print("Model saved → fraud_model.pkl")
+    y_pred = model.predict(X_test)
+    print(f"Model saved → {MODEL_FILE} (versi {version}: {path})")
 
-print("\n=== Classification Report (IMPROVED) ===")
-print(classification_report(y_test, y_pred))
+    print("\n=== Classification Report (IMPROVED) ===")
+    print(classification_report(y_test, y_pred))
 
-print("\n=== Confusion Matrix ===")
-print(confusion_matrix(y_test, y_pred))
+    print("\n=== Confusion Matrix ===")
+    print(confusion_matrix(y_test, y_pred))
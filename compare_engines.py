@@ -0,0 +1,91 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score, recall_score
+from sklearn.model_selection import train_test_split
+
+from feature_matrix import load_frame
+from model_training import ENGINES, DEFAULT_REBALANCE, build_model, fit_model
+from rebalancing import rebalance
+
+# ==========================================================
+#   PERBANDINGAN ENGINE: RandomForest (+SMOTE) vs HistGradientBoosting
+# ==========================================================
+# Split train/test sama dengan classification_RF.py. Per engine dicatat:
+#   train_seconds     : rebalancing (SMOTE untuk rf) + fit
+#   batch_ms_per_1k   : predict_proba seluruh test set, dinormalisasi per 1000 klaim
+#   single_ms         : median latency predict_proba satu klaim (seperti dashboard)
+#   macro_f1, recall_HIGH
+# --scale N mengulang data training N kali (dengan noise kecil) untuk melihat
+# pertumbuhan waktu training di data yang lebih besar.
+
+COMPARISON_FILE = "engine_comparison.csv"
+SINGLE_CALLS = 100
+
+
+def scaled(X, y, factor, seed=42):
+    if factor <= 1:
+        return X, y
+    rng = np.random.default_rng(seed)
+    X_big = pd.concat([X] * factor, ignore_index=True)
+    noise = rng.normal(1.0, 0.01, size=X_big.shape)
+    return X_big * noise, pd.concat([y] * factor, ignore_index=True)
+
+
+def evaluate_engine(engine, X_train, y_train, X_test, y_test, n_jobs):
+    start = time.perf_counter()
+    X_train, y_train, class_weight = rebalance(X_train, y_train, DEFAULT_REBALANCE[engine])
+    model = build_model(engine, n_jobs)
+    fit_model(model, X_train, y_train, n_jobs, class_weight=class_weight)
+    train_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proba = model.predict_proba(X_test)
+    batch_seconds = time.perf_counter() - start
+    y_pred = model.classes_[proba.argmax(axis=1)]
+
+    one = X_test.iloc[:1]
+    latencies = []
+    for _ in range(SINGLE_CALLS):
+        t0 = time.perf_counter()
+        model.predict_proba(one)
+        latencies.append(time.perf_counter() - t0)
+
+    return {
+        'engine': engine,
+        'n_train': len(X_train),
+        'train_seconds': round(train_seconds, 3),
+        'batch_ms_per_1k': round(batch_seconds / len(X_test) * 1e6, 3),
+        'single_ms': round(float(np.median(latencies)) * 1000, 3),
+        'macro_f1': round(f1_score(y_test, y_pred, average='macro'), 4),
+        'recall_HIGH': round(recall_score(y_test, y_pred, labels=['HIGH'], average='macro'), 4),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bandingkan engine training model fraud")
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--scale", type=int, default=1, help="ulang data training N kali")
+    parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    X, y = load_frame()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    X_train, y_train = scaled(X_train, y_train, args.scale)
+
+    results = pd.DataFrame([
+        evaluate_engine(engine, X_train, y_train, X_test, y_test, args.n_jobs)
+        for engine in args.engines.split(",")
+    ]).set_index('engine')
+    results.to_csv(COMPARISON_FILE)
+
+    print(f"=== Engine: {len(X_train)} baris training, {len(X_test)} baris test, "
+          f"{args.n_jobs} worker ===")
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(results)
+    print(f"✔ {COMPARISON_FILE} saved.")
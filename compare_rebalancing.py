@@ -0,0 +1,94 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+from sklearn.metrics import f1_score, recall_score
+from sklearn.model_selection import train_test_split
+
+from benchmark_rf import PeakMemory, tree_rss
+from compare_engines import scaled
+from feature_matrix import load_frame
+from model_training import build_model, fit_model
+from rebalancing import STRATEGIES, rebalance
+
+# ==========================================================
+#   PERBANDINGAN STRATEGI REBALANCING (biaya vs recall per kelas)
+# ==========================================================
+# Split train/test sama dengan classification_RF.py; test set tidak di-rebalance.
+# Per strategi dicatat:
+#   rebalance_seconds / rebalance_peak_mb : waktu & puncak alokasi (tracemalloc)
+#                                            langkah rebalancing saja
+#   n_train                                : baris training setelah rebalancing
+#   fit_seconds / fit_peak_mb              : waktu fit & kenaikan RSS puncak saat fit
+#   recall_<kelas>, macro_f1               : pada test set
+# --scale N mengulang data training N kali (noise kecil) → biaya SMOTE exact vs
+# aproksimasi di data besar.
+#
+# Contoh:
+#   python compare_rebalancing.py
+#   python compare_rebalancing.py --strategies smote,smote_approx --scale 10 --engine hgb
+
+REBALANCE_FILE = "rebalance_comparison.csv"
+
+
+def evaluate_strategy(strategy, X_train, y_train, X_test, y_test, engine, n_jobs):
+    tracemalloc.start()
+    start = time.perf_counter()
+    X_res, y_res, class_weight = rebalance(X_train, y_train, strategy)
+    rebalance_seconds = time.perf_counter() - start
+    rebalance_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    model = build_model(engine, n_jobs)
+    base = tree_rss(os.getpid())
+    with PeakMemory() as mem:
+        start = time.perf_counter()
+        fit_model(model, X_res, y_res, n_jobs, class_weight=class_weight)
+        fit_seconds = time.perf_counter() - start
+
+    y_pred = model.predict(X_test)
+    recall = recall_score(y_test, y_pred, labels=model.classes_, average=None)
+    return {
+        'strategy': strategy,
+        'rebalance_seconds': round(rebalance_seconds, 3),
+        'rebalance_peak_mb': round(rebalance_peak / 2**20, 1),
+        'n_train': len(X_res),
+        'fit_seconds': round(fit_seconds, 3),
+        'fit_peak_mb': round(max(mem.peak - base, 0) / 2**20, 1),
+        **{f'recall_{c}': round(r, 4) for c, r in zip(model.classes_, recall)},
+        'macro_f1': round(f1_score(y_test, y_pred, average='macro'), 4),
+    }
+
+
+if __name__ == "__main__":
+    from model_training import ENGINES
+
+    parser = argparse.ArgumentParser(description="Bandingkan strategi rebalancing kelas")
+    parser.add_argument("--strategies", default=",".join(STRATEGIES))
+    parser.add_argument("--engine", choices=ENGINES, default="rf")
+    parser.add_argument("--scale", type=int, default=1, help="ulang data training N kali")
+    parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    X, y = load_frame()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    X_train, y_train = scaled(X_train, y_train, args.scale)
+
+    results = []
+    for strategy in args.strategies.split(","):
+        row = evaluate_strategy(strategy, X_train, y_train, X_test, y_test, args.engine, args.n_jobs)
+        results.append(row)
+        print(f"  {strategy:<13} rebalance {row['rebalance_seconds']:.2f}s / "
+              f"{row['rebalance_peak_mb']:.0f} MB, fit {row['fit_seconds']:.2f}s")
+    results = pd.DataFrame(results).set_index('strategy')
+    results.to_csv(REBALANCE_FILE)
+
+    print(f"\n=== Rebalancing ({args.engine}): {len(X_train)} baris training, "
+          f"{len(X_test)} baris test ===")
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(results)
+    print(f"✔ {REBALANCE_FILE} saved.")
@@ -0,0 +1,168 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+#     DAILY COUNT INDEX (entity × hari, prefix sum / cumsum)
+# ==========================================================
+# "Berapa klaim entity X dalam k hari terakhir" = selisih dua cumsum.
+#   window (date - k, date]  ==  hari (d - k + 1) .. d
+# Sama dengan definisi window di feature_engineering.py selama claim_date
+# berupa tanggal (tanpa jam).
+#
+# layout "dense"  : matriks cum[entity, hari + 1]   → O(1) lookup
+#                   (cocok untuk provider: sedikit entity, banyak klaim)
+# layout "sparse" : hanya (entity, hari) yang ada klaimnya, disimpan sebagai
+#                   key flat terurut + cumsum → binary search di key
+#                   (cocok untuk NIK: jutaan entity, sedikit klaim per NIK)
+
+PROVIDER_INDEX_FILE = "provider_daily_index.npz"
+NIK_INDEX_FILE = "nik_daily_index.npz"
+NIK_DIAGNOSIS_INDEX_FILE = "nik_diagnosis_daily_index.npz"
+
+
+def _to_days(dates, day0) -> np.ndarray:
+    d = pd.to_datetime(pd.Series(dates)).dt.normalize().to_numpy().astype("datetime64[D]")
+    return (d - day0).astype(np.int64)
+
+
+class DailyCountIndex:
+
+    def __init__(self, entities, day0, n_days, layout, cum, flat=None):
+        self.entities = pd.Index(entities)
+        self.day0 = np.datetime64(day0, "D")
+        self.n_days = int(n_days)
+        self.layout = layout
+        self.cum = cum
+        self.flat = flat
+
+    # ============ BUILD ============
+    @classmethod
+    def build(cls, entities, dates, layout="dense"):
+        entities = pd.Series(entities).to_numpy()
+        dates = pd.to_datetime(pd.Series(dates)).dt.normalize()
+
+        uniq = np.unique(entities)
+        codes = pd.Index(uniq).get_indexer(entities).astype(np.int64)
+
+        day0 = dates.min().to_numpy().astype("datetime64[D]")
+        days = _to_days(dates, day0)
+        n_days = int(days.max()) + 1 if len(days) else 0
+
+        if layout == "dense":
+            counts = np.bincount(
+                codes * n_days + days, minlength=len(uniq) * n_days
+            ).reshape(len(uniq), n_days)
+            cum = np.zeros((len(uniq), n_days + 1), dtype=np.int64)
+            np.cumsum(counts, axis=1, out=cum[:, 1:])
+            return cls(uniq, day0, n_days, layout, cum)
+
+        if layout == "sparse":
+            keys = codes * n_days + days
+            flat, counts = np.unique(keys, return_counts=True)
+            cum = np.r_[0, np.cumsum(counts)].astype(np.int64)
+            return cls(uniq, day0, n_days, layout, cum, flat)
+
+        raise ValueError(f"Layout tidak dikenal: {layout}")
+
+    # ============ EXTEND (klaim baru, tanpa membangun ulang dari history) ============
+    def extend(self, entities, dates):
+        # entity baru ditambahkan di belakang, hari baru memperpanjang sumbu hari;
+        # tanggal sebelum day0 tidak didukung (pakai build ulang)
+        entities = pd.Series(entities).to_numpy()
+        days = _to_days(dates, self.day0)
+        if len(days) == 0:
+            return self
+        if days.min() < 0:
+            raise ValueError("Tanggal klaim baru sebelum day0 index → build ulang")
+
+        added = pd.Index(pd.unique(entities)).difference(self.entities, sort=False)
+        all_entities = self.entities.append(added)
+        codes = all_entities.get_indexer(entities).astype(np.int64)
+        n_days = max(self.n_days, int(days.max()) + 1)
+
+        if self.layout == "dense":
+            counts = np.bincount(
+                codes * n_days + days, minlength=len(all_entities) * n_days
+            ).reshape(len(all_entities), n_days)
+            # cum lama diperpanjang dengan nilai terakhirnya (tidak ada klaim di hari baru)
+            cum = np.zeros((len(all_entities), n_days + 1), dtype=np.int64)
+            cum[:len(self.entities), :self.n_days + 1] = self.cum
+            cum[:len(self.entities), self.n_days + 1:] = self.cum[:, -1:]
+            cum[:, 1:] += np.cumsum(counts, axis=1)
+            self.cum = cum
+        else:
+            old_codes, old_days = np.divmod(self.flat, max(self.n_days, 1))
+            keys = np.concatenate([old_codes * n_days + old_days, codes * n_days + days])
+            weights = np.concatenate([np.diff(self.cum), np.ones(len(codes), dtype=np.int64)])
+            flat, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse.reshape(-1), weights=weights, minlength=len(flat))
+            self.flat = flat
+            self.cum = np.r_[0, np.cumsum(counts)].astype(np.int64)
+
+        self.entities = all_entities
+        self.n_days = n_days
+        return self
+
+    # ============ QUERY ============
+    def n_claims(self):
+        return int(self.cum[:, -1].sum()) if self.layout == "dense" else int(self.cum[-1])
+
+    def _prefix(self, codes, days) -> np.ndarray:
+        # jumlah klaim entity `codes` dengan hari <= days
+        days = np.clip(days, -1, self.n_days - 1)
+        if self.layout == "dense":
+            return self.cum[codes, days + 1]
+        pos = np.searchsorted(self.flat, codes * self.n_days + days, side="right")
+        return self.cum[pos]
+
+    def count_last(self, entities, dates, days=30) -> np.ndarray:
+        # jumlah klaim entity di window (date - days, date]
+        codes = self.entities.get_indexer(pd.Series(entities).to_numpy()).astype(np.int64)
+        d = _to_days(dates, self.day0)
+
+        known = codes >= 0
+        out = np.zeros(len(codes), dtype=np.int64)
+        c, dd = codes[known], d[known]
+        out[known] = self._prefix(c, dd) - self._prefix(c, np.maximum(dd - days, -1))
+        return out
+
+    def monthly_counts(self) -> pd.DataFrame:
+        # pivot entity × year_month (sama dengan groupby(...).size().unstack(fill_value=0))
+        if self.layout == "dense":
+            daily = np.diff(self.cum, axis=1)
+            codes, days = np.nonzero(daily)
+            counts = daily[codes, days]
+        else:
+            codes, days = np.divmod(self.flat, self.n_days)
+            counts = np.diff(self.cum)
+
+        months = pd.PeriodIndex(pd.to_datetime(self.day0 + days), freq="M")
+        monthly = (
+            pd.Series(counts, index=[self.entities[codes], months])
+            .groupby(level=[0, 1]).sum()
+            .unstack(fill_value=0)
+        )
+        monthly.index.name = None
+        monthly.columns.name = "year_month"
+        return monthly
+
+    # ============ PERSIST ============
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            entities=self.entities.to_numpy().astype(str),
+            day0=np.array(self.day0),
+            n_days=np.array(self.n_days),
+            layout=np.array(self.layout),
+            cum=self.cum,
+            flat=self.flat if self.flat is not None else np.zeros(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def load(cls, path):
+        z = np.load(path)
+        layout = str(z["layout"])
+        return cls(
+            z["entities"], z["day0"], int(z["n_days"]), layout, z["cum"],
+            z["flat"] if layout == "sparse" else None,
+        )
@@ -2,6 +2,13 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 from google import generativeai as genai
+import os
+import sys
+
+# modul pipeline ada di root repo (satu level di atas dashboard/)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from daily_index import DailyCountIndex, PROVIDER_INDEX_FILE
+
 st.set_page_config(
     page_title="Fraud Detection Dashboard",
     layout="wide",
@@ -196,6 +203,44 @@ if "provider_id" in df.columns and "total_claim_amount" in df.columns:
     st.plotly_chart(fig, use_container_width=True)
 
 
+# ======================
+# 6. Klaim per Provider — k Hari Terakhir (daily count index)
+# ======================
+if "provider_id" in df.columns and "claim_date" in df.columns:
+    st.markdown("#### Klaim per Provider — k Hari Terakhir")
+
+    # Pakai index yang sama dengan feature_engineering.py; build ulang jika belum ada
+    if os.path.exists(PROVIDER_INDEX_FILE):
+        provider_index = DailyCountIndex.load(PROVIDER_INDEX_FILE)
+    else:
+        provider_index = DailyCountIndex.build(
+            df["provider_id"], pd.to_datetime(df["claim_date"], errors="coerce"), layout="dense"
+        )
+
+    last_day = pd.Timestamp(provider_index.day0 + provider_index.n_days - 1)
+    win_col1, win_col2 = st.columns(2)
+    k_days = win_col1.slider("Jumlah hari (k)", min_value=1, max_value=180, value=30)
+    ref_date = win_col2.date_input("Tanggal acuan", value=last_day.date())
+
+    providers = provider_index.entities
+    recent = pd.DataFrame({
+        "provider_id": providers,
+        "count": provider_index.count_last(
+            providers, [pd.Timestamp(ref_date)] * len(providers), days=k_days
+        ),
+    }).sort_values("count", ascending=False)
+
+    fig = px.bar(
+        recent,
+        x="provider_id",
+        y="count",
+        title=f"Jumlah Klaim {k_days} Hari Terakhir s/d {ref_date}",
+        labels={"provider_id": "Provider ID", "count": "Jumlah Klaim"},
+        color="count",
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
 
 # ===== AI SUMMARY DASHBOARD =====
 
@@ -572,26 +617,34 @@ with st.expander("📥 Upload New Claims CSV & Run Pipeline", expanded=False):
             import joblib
             from sklearn.metrics import classification_report
             try:
-                save_name = "dummy_claims_2024_2025.csv"
+                save_name = "uploaded_claims.csv"
                 with open(save_name, "wb") as f:
                     f.write(uploaded.getbuffer())
                 st.info(f"Saved uploaded file as: {save_name}")
 
-                # 1) Feature engineering (will read dummy_claims_2024_2025.csv and output dummy_claims_with_features.csv)
-                st.info("Running feature_engineering.py ...")
-                subprocess.run(["python","feature_engineering.py"], check=True)
+                # 1) Feature engineering incremental: hanya klaim upload yang dihitung
+                #    (history + state di feature_state.pkl), output baris baru → new_claims_with_features.csv
+                st.info("Running feature_engineering.py --incremental ...")
+                subprocess.run(["python","feature_engineering.py","--incremental",save_name], check=True)
                 st.success("Feature engineering finished.")
 
-                # 2) Train / retrain classifier (classification_RF.py will produce fraud_model.pkl)
-                st.info("Running classification_RF.py (train model) ...")
-                subprocess.run(["python","classification_RF.py"], check=True)
+                # 2) Labeling rule incremental: klaim upload di-append ke store label
+                #    (dummy_claims_with_fraud_label.csv) → batch baru ikut masuk training
+                st.info("Running fraud_label.py --incremental ...")
+                subprocess.run(["python","fraud_label.py","--incremental"], check=True)
+                st.success("Fraud labeling finished.")
+
+                # 3) Train / retrain classifier (classification_RF.py will produce fraud_model.pkl)
+                #    --incremental: tree baru dari batch baru ditambahkan ke versi model terakhir
+                st.info("Running classification_RF.py --incremental (train model) ...")
+                subprocess.run(["python","classification_RF.py","--incremental"], check=True)
                 st.success("Model training finished and fraud_model.pkl saved.")
 
-                # 3) Load model and run prediction on newly engineered data
+                # 4) Load model and run prediction on newly engineered data
                 st.info("Loading model and predicting labels for new claims ...")
                 model = joblib.load("fraud_model.pkl")
 
-                new_feat_path = "dummy_claims_with_features.csv"
+                new_feat_path = "new_claims_with_features.csv"
                 if not os.path.exists(new_feat_path):
                     st.error(f"File not found after feature engineering: {new_feat_path}")
                 else:
@@ -631,12 +684,12 @@ with st.expander("📥 Upload New Claims CSV & Run Pipeline", expanded=False):
                     new_df.to_csv(new_out, index=False)
                     st.success(f"Predictions saved to: {new_out}")
 
-                # 4) Merge with existing dataset (gabung_dataset.py will create/overwrite Data_Claims_classification.csv)
+                # 5) Merge with existing dataset (gabung_dataset.py will create/overwrite Data_Claims_classification.csv)
                 st.info("Merging new claims into main dataset (running gabung_dataset.py) ...")
                 subprocess.run(["python","gabung_dataset.py"], check=True)
                 st.success("Merge complete. Data_Claims_classification.csv updated.")
 
-                # 5) reload main data into dashboard (best-effort)
+                # 6) reload main data into dashboard (best-effort)
                 try:
                     df_updated = pd.read_csv("Data_Claims_classification.csv", dtype={"NIK": str})
                     st.success(f"Reloaded Data_Claims_classification.csv ({len(df_updated):,} rows).")
@@ -1,161 +1,881 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
-# === 1️⃣ BACA DATA DUMMY HASIL GENERATOR ===
-df = pd.read_csv('dummy_claims_2024_2025.csv', dtype={"NIK": str})
+from daily_index import (
+    DailyCountIndex, PROVIDER_INDEX_FILE, NIK_INDEX_FILE, NIK_DIAGNOSIS_INDEX_FILE
+)
+from rolling_window import rolling_nunique_multi
+from feature_registry import FeatureRegistry
+import feature_state
 
-# Pastikan format tanggal
-df['claim_date'] = pd.to_datetime(df['claim_date'])
-df['service_date'] = pd.to_datetime(df['service_date'])
+# === CONFIG ===
+RAW_FILE = 'dummy_claims_2024_2025.csv'
+FEATURE_FILE = 'dummy_claims_with_features.csv'
+NEW_FEATURE_FILE = 'new_claims_with_features.csv'   # hanya baris baru (mode --incremental)
+FEATURE_PATCH_FILE = 'feature_patches.csv'          # baris lama yang berubah (mode --incremental)
+FEATURE_SUBSET_FILE = 'claims_feature_subset.csv'   # hasil --features (sebagian kolom)
 
-# Urutkan data
-df = df.sort_values(by=['provider_id', 'claim_date']).reset_index(drop=True)
+# Horizon (hari) fitur window. 30 hari selalu dihitung karena dipakai model
+# & labeling dengan nama kolom lama (duplicate_ID_count_month, dst.)
+WINDOW_HORIZONS = [7, 30, 90]
 
-# === 2️⃣ FITUR TURUNAN DASAR ===
-df['avg_cost_per_procedure'] = df['total_claim_amount'] / df['num_procedures']
-df['diagnosis_cost_ratio'] = df['total_claim_amount'] / df['tarif_standar_diagnosis']
-df['verification_delay_days'] = (df['claim_date'] - df['service_date']).dt.days
+LEGACY_WINDOW_COLS = {
+    ("duplicate_ID_count_{h}d", 30): "duplicate_ID_count_month",
+}
 
-# === 3️⃣ FITUR LANJUTAN ===
 
-# --- 3.1 Duplicate_ID_count (TOTAL DUPLICATE)
-nik_counts = df['NIK'].value_counts()
-df['duplicate_ID_count'] = df['NIK'].map(lambda x: nik_counts[x] - 1).astype(int)
+def window_col(template, h):
+    return LEGACY_WINDOW_COLS.get((template, h), template.format(h=h))
 
-# --- 3.1b Duplicate_ID_count_month (ROLLING 30 DAYS)
-df = df.sort_values(["NIK", "claim_date"])
-df["duplicate_ID_count_month"] = 0
 
-for nik, g in df.groupby("NIK"):
-    idx = g.index
-    dates = g["claim_date"]
+def window_horizons():
+    return sorted(set(WINDOW_HORIZONS) | {30})
 
-    counts = []
-    for d in dates:
-        window = dates[(dates > d - pd.Timedelta(days=30)) & (dates <= d)]
-        counts.append(len(window) - 1)
 
-    df.loc[idx, "duplicate_ID_count_month"] = counts
+# === 1️⃣ BACA DATA ===
+def parse_dates(df):
+    # Pastikan format tanggal
+    df['claim_date'] = pd.to_datetime(df['claim_date'])
+    df['service_date'] = pd.to_datetime(df['service_date'])
+    return df
 
 
-# --- 3.2 Time_between_admissions
-df['time_between_admissions'] = (
-    df.groupby('NIK')['claim_date'].diff().dt.days.fillna(0)
-)
+def load_claims(path):
+    return parse_dates(pd.read_csv(path, dtype={"NIK": str}))
 
-# --- 3.3 Num_claims_last_30d_by_provider
-df = df.sort_values(["provider_id", "claim_date"])
-df["num_claims_last_30d_by_provider"] = 0
 
-for pid, g in df.groupby("provider_id"):
-    idx = g.index
-    dates = g["claim_date"]
+# === 2️⃣ FITUR TURUNAN DASAR ===
+def add_basic_features(df):
+    df['avg_cost_per_procedure'] = df['total_claim_amount'] / df['num_procedures']
+    df['diagnosis_cost_ratio'] = df['total_claim_amount'] / df['tarif_standar_diagnosis']
+    df['verification_delay_days'] = (df['claim_date'] - df['service_date']).dt.days
+    return df
+
+
+# --- 2b Daily count index (provider × hari, NIK × hari, NIK+diagnosis × hari)
+# Semua pertanyaan "berapa klaim dalam k hari terakhir" cukup 2 lookup cumsum.
+INDEX_NAMES = ["provider", "nik", "nik_diagnosis"]
+INDEX_LAYOUTS = {"provider": "dense", "nik": "sparse", "nik_diagnosis": "sparse"}
+INDEX_FILES = {
+    "provider": PROVIDER_INDEX_FILE,
+    "nik": NIK_INDEX_FILE,
+    "nik_diagnosis": NIK_DIAGNOSIS_INDEX_FILE,
+}
+
+
+def index_keys(df, name):
+    if name == "provider":
+        return df['provider_id']
+    if name == "nik":
+        return df['NIK']
+    if name == "nik_diagnosis":
+        return df['NIK'] + '|' + df['diagnosis_code']
+    raise ValueError(f"Index tidak dikenal: {name}")
+
+
+def build_index(df, name):
+    return DailyCountIndex.build(index_keys(df, name), df['claim_date'], layout=INDEX_LAYOUTS[name])
+
+
+def build_indexes(df):
+    return {name: build_index(df, name) for name in INDEX_NAMES}
+
+
+# Disimpan ke disk supaya dashboard / rule lain bisa pakai index yang sama.
+def save_indexes(indexes):
+    for name, index in indexes.items():
+        index.save(INDEX_FILES[name])
+
+
+def extend_indexes(history, new):
+    # index tersimpan + hari klaim baru saja; file tidak ada / tidak cocok dengan
+    # history (jumlah klaim beda) / tanggal mundur → build ulang dari history + baru
+    indexes = {}
+    for name in INDEX_NAMES:
+        try:
+            index = DailyCountIndex.load(INDEX_FILES[name])
+            if index.n_claims() != len(history):
+                raise ValueError("index tidak sesuai history")
+            indexes[name] = index.extend(index_keys(new, name), new['claim_date'])
+        except (OSError, ValueError):
+            frame = pd.concat([history[feature_state.CARRY_COLS], new[feature_state.CARRY_COLS]])
+            indexes[name] = build_index(frame, name)
+    return indexes
+
+
+# --- 2c Window features multi-horizon (NIK, provider, NIK+diagnosis)
+# Semua horizon dihitung sekaligus: count = 2 lookup index per horizon,
+# unique patients = satu sweep terurut per provider untuk semua horizon.
+WINDOW_TEMPLATES = [
+    "duplicate_ID_count_{h}d", "num_claims_last_{h}d_by_provider",
+    "num_unique_patients_last_{h}d", "duplicate_diagnosis_count_{h}d",
+]
 
-    counts = []
-    for d in dates:
-        window = dates[(dates > d - pd.Timedelta(days=30)) & (dates <= d)]
-        counts.append(len(window))
 
-    df.loc[idx, "num_claims_last_30d_by_provider"] = counts
+def window_feature_columns(horizons):
+    return [window_col(t, h) for h in horizons for t in WINDOW_TEMPLATES]
+
+
+def provider_window_features(df, provider_index, horizons, order=None):
+    window_features = pd.DataFrame(index=df.index)
+    unique_patients = rolling_nunique_multi(
+        df['provider_id'], df['NIK'], df['claim_date'], horizons, order=order
+    )
+    for h in horizons:
+        window_features[window_col("num_claims_last_{h}d_by_provider", h)] = (
+            provider_index.count_last(df['provider_id'], df['claim_date'], days=h)
+        )
+        window_features[window_col("num_unique_patients_last_{h}d", h)] = unique_patients[h]
+    return window_features
+
+
+def nik_window_features(df, nik_index, nik_diag_index, horizons):
+    window_features = pd.DataFrame(index=df.index)
+    nik_diag = df['NIK'] + '|' + df['diagnosis_code']
+    for h in horizons:
+        window_features[window_col("duplicate_ID_count_{h}d", h)] = (
+            nik_index.count_last(df['NIK'], df['claim_date'], days=h) - 1
+        )
+        window_features[window_col("duplicate_diagnosis_count_{h}d", h)] = (
+            nik_diag_index.count_last(nik_diag, df['claim_date'], days=h) - 1
+        )
+    return window_features
+
+
+def window_feature_frame(df, indexes, horizons):
+    window_features = pd.concat([
+        provider_window_features(df, indexes["provider"], horizons),
+        nik_window_features(df, indexes["nik"], indexes["nik_diagnosis"], horizons),
+    ], axis=1)
+    return window_features[window_feature_columns(horizons)]
+
+
+# --- 2d Sort plan: tiap urutan baris dihitung sekali sebagai permutasi posisi
+# (np.lexsort atas kode kolom, stabil seperti sort_values multi-kolom) lalu
+# dipakai ulang oleh semua langkah. df sendiri tidak diacak; hasil ditulis
+# balik lewat permutasi yang sama.
+PROVIDER_ORDER = ['provider_id', 'claim_date']
+# urutan baris versi linear lama saat 3.5–3.10 (provider sort → NIK sort → provider sort)
+SERIAL_ORDER = ['provider_id', 'claim_date', 'NIK']
+
+
+def sort_codes(df, context, col):
+    codes = context.setdefault("codes", {})
+    if col not in codes:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            codes[col] = values.to_numpy().astype("datetime64[ns]").astype(np.int64)
+        else:
+            codes[col] = pd.factorize(values, sort=True)[0]
+    return codes[col]
+
+
+def sort_order(df, context, keys):
+    orders = context.setdefault("orders", {})
+    if tuple(keys) not in orders:
+        orders[tuple(keys)] = np.lexsort([sort_codes(df, context, c) for c in reversed(keys)])
+    return orders[tuple(keys)]
+
+
+def group_gap_days(df, context, group_keys, order_keys):
+    # selisih hari dengan klaim sebelumnya di grup yang sama (NaN untuk klaim
+    # pertama), urutan dalam grup mengikuti order_keys — sama dengan
+    # df.sort_values(order_keys).groupby(group_keys)['claim_date'].diff().dt.days
+    order = sort_order(df, context, group_keys + order_keys)
+    t = sort_codes(df, context, 'claim_date')[order]
+
+    same_group = np.ones(len(order) - 1 if len(order) else 0, dtype=bool)
+    for col in group_keys:
+        g = sort_codes(df, context, col)[order]
+        same_group &= g[1:] == g[:-1]
+
+    gaps = np.full(len(order), np.nan)
+    day = pd.Timedelta(days=1).value
+    gaps[order[1:][same_group]] = np.floor_divide(np.diff(t), day)[same_group]
+    return pd.Series(gaps, index=df.index)
+
+
+def final_order(df, context):
+    # urutan output: sort claim_date (stabil) dari urutan serial → tie urut
+    # provider_id, NIK, lalu urutan input (sama dengan feature_engineering_chunked.py)
+    serial = sort_order(df, context, SERIAL_ORDER)
+    by_date = pd.Series(df['claim_date'].to_numpy()[serial]).sort_values(kind='stable').index.to_numpy()
+    return serial[by_date]
+
+
+# --- 3.2 Time_between_admissions (df sudah urut NIK, claim_date)
+def add_time_between_admissions(df):
+    df['time_between_admissions'] = (
+        df.groupby('NIK')['claim_date'].diff().dt.days.fillna(0)
+    )
+    return df
 
 
-# --- 3.4 Num_unique_patients_last_30d
-df["num_unique_patients_last_30d"] = 0
+# --- 3.5 Provider_claim_rate_vs_peer
+def add_provider_claim_rate(df, provider_total):
+    peer_avg = provider_total.mean()
+    df['provider_claim_rate_vs_peer'] = df['provider_id'].map(provider_total / peer_avg)
+    return df
 
-for pid, g in df.groupby("provider_id"):
-    idx = g.index
-    dates = g["claim_date"]
-    niks = g["NIK"]
 
-    uniques = []
-    for d in dates:
-        window_nik = niks[(dates > d - pd.Timedelta(days=30)) & (dates <= d)]
-        uniques.append(window_nik.nunique())
+# --- 3.6 Claim_rejection_rate_provider (simulasi kecil, satu angka acak per baris)
+def add_rejection_rate(df, seed=42, order=None):
+    # order: urutan baris saat angka acak dibagikan (default urutan df)
+    np.random.seed(seed)
+    rates = np.random.uniform(0.02, 0.15, size=len(df))
+    if order is not None:
+        rates[order] = rates.copy()
+    df['claim_rejection_rate_provider'] = rates
+    return df
 
-    df.loc[idx, "num_unique_patients_last_30d"] = uniques
 
+# --- 3.7 Month_over_month_claim_growth
+def add_month_over_month(df, monthly_claims):
+    df['year_month'] = df['claim_date'].dt.to_period('M')
 
-# --- 3.5 Provider_claim_rate_vs_peer
-provider_total = df.groupby('provider_id')['total_claim_amount'].sum()
-peer_avg = provider_total.mean()
+    mom_growth = monthly_claims.pct_change(axis=1)
+    mom_growth_long = mom_growth.stack().rename('month_over_month_claim_growth')
 
-df['provider_claim_rate_vs_peer'] = df['provider_id'].map(
-    lambda x: provider_total[x] / peer_avg
-)
+    df = df.drop(columns=['month_over_month_claim_growth'], errors='ignore')
+    df = df.join(mom_growth_long, on=['provider_id', 'year_month'])
 
-# --- 3.6 Claim_rejection_rate_provider (simulasi kecil)
-np.random.seed(42)
-df['claim_rejection_rate_provider'] = df['provider_id'].map(
-    lambda x: np.random.uniform(0.02, 0.15)
-)
+    df['sudden_spike_flag'] = np.where(
+        np.isinf(df['month_over_month_claim_growth']), 1, 0
+    )
 
-# --- 3.7 Month_over_month_claim_growth
-df['year_month'] = df['claim_date'].dt.to_period('M')
+    df['month_over_month_claim_growth'] = df['month_over_month_claim_growth'].replace(
+        [np.inf, -np.inf], np.nan
+    )
 
-monthly_claims = df.groupby(['provider_id', 'year_month']).size().unstack(fill_value=0)
-mom_growth = monthly_claims.pct_change(axis=1)
-mom_growth_long = mom_growth.stack().rename('month_over_month_claim_growth')
+    df['new_provider_month_flag'] = df['month_over_month_claim_growth'].isna().astype(int)
+    df['month_over_month_claim_growth'] = df['month_over_month_claim_growth'].fillna(0)
+    return df
 
-df = df.join(mom_growth_long, on=['provider_id', 'year_month'])
 
-df['sudden_spike_flag'] = np.where(
-    np.isinf(df['month_over_month_claim_growth']), 1, 0
-)
+# --- 3.8 Avg_claim_per_patient
+def add_avg_claim_per_patient(df):
+    df['avg_claim_per_patient'] = (
+        df['total_claim_amount'] /
+        df['num_unique_patients_last_30d'].replace(0, np.nan)
+    )
+    return df
+
+
+# --- 3.9 Claim_fragmentation_score (df sudah urut provider_id, claim_date)
+def add_claim_fragmentation(df):
+    diff_days = (
+        df.groupby(['NIK', 'diagnosis_code'])['claim_date']
+        .diff().dt.days
+    )
+    return fragmentation_from_gaps(df, diff_days)
+
 
-df['month_over_month_claim_growth'] = df['month_over_month_claim_growth'].replace(
-    [np.inf, -np.inf], np.nan
+def fragmentation_from_gaps(df, diff_days):
+    # bucket jarak hari (NaN / <= 0 → 0): (0, 3] → skor 3, (3, 7] → skor 1
+    gap = np.asarray(diff_days, dtype=float)
+    within_3 = (gap > 0) & (gap <= 3)
+    within_7 = (gap > 0) & (gap <= 7)
+
+    df['claim_fragmentation'] = within_7.astype(np.int64)
+    df['claim_fragmentation_score'] = np.where(within_3, 3, np.where(within_7, 1, 0)).astype(np.int64)
+    return df
+
+
+# --- 3.10 Service_mix_index (entropy)
+# Satu tabel hitung (provider, diagnosis) untuk semua provider. Suku entropy
+# disusun seperti value_counts (count turun, tie = kemunculan pertama) lalu
+# dijumlah per kelompok provider dengan jumlah diagnosis yang sama, sehingga
+# hasil identik bit-per-bit dengan value_counts + np.sum per provider.
+def service_mix_entropy_map(provider_id, diagnosis_code):
+    pcodes, providers = pd.factorize(np.asarray(provider_id))
+    dcodes, diagnoses = pd.factorize(np.asarray(diagnosis_code))
+    pair_codes, pairs = pd.factorize(pcodes.astype(np.int64) * len(diagnoses) + dcodes)
+    counts = np.bincount(pair_codes)
+    pair_provider = pairs // len(diagnoses)
+
+    order = np.lexsort((np.arange(len(pairs)), -counts, pair_provider))
+    counts, pair_provider = counts[order], pair_provider[order]
+    p = counts / np.bincount(pcodes)[pair_provider]
+    terms = p * np.log2(p)
+
+    n_terms = np.bincount(pair_provider, minlength=len(providers))
+    starts = np.cumsum(n_terms) - n_terms
+    entropy = np.zeros(len(providers))
+    for n in np.unique(n_terms):
+        sel = np.flatnonzero(n_terms == n)
+        entropy[sel] = -terms[starts[sel][:, None] + np.arange(n)].sum(axis=1)
+    return pd.Series(entropy, index=providers)
+
+
+def add_service_mix_index(df):
+    entropy_map = service_mix_entropy_map(df['provider_id'], df['diagnosis_code'])
+    df['service_mix_index'] = df['provider_id'].map(entropy_map)
+    return df
+
+
+# === 3️⃣ REGISTRY FITUR (input → output, dihitung sesuai kebutuhan) ===
+# Tiap langkah mendaftarkan kolom yang dibaca & dihasilkan. Pemanggil
+# (fraud_label.py, classification_RF.py, CLI --features) cukup minta kolom
+# yang dibutuhkan; langkah upstream ikut dijalankan, sisanya dilewati.
+# Langkah yang butuh urutan tertentu memakai permutasi dari sort plan (2d),
+# sehingga urutan baris df tidak berubah.
+MOM_COLS = ['month_over_month_claim_growth', 'sudden_spike_flag', 'new_provider_month_flag']
+FRAGMENTATION_COLS = ['claim_fragmentation', 'claim_fragmentation_score']
+
+FEATURES = FeatureRegistry()
+
+
+def context_index(df, context, name):
+    # index dipakai bersama antar langkah (dan bisa diisi dari luar, mis. run_full)
+    indexes = context.setdefault("indexes", {})
+    if name not in indexes:
+        indexes[name] = build_index(df, name)
+    return indexes[name]
+
+
+@FEATURES.register(
+    "basic_features",
+    inputs=['total_claim_amount', 'num_procedures', 'tarif_standar_diagnosis',
+            'claim_date', 'service_date'],
+    outputs=['avg_cost_per_procedure', 'diagnosis_cost_ratio', 'verification_delay_days'],
 )
+def _basic_features(df, context):
+    return add_basic_features(df)
+
 
-df['new_provider_month_flag'] = df['month_over_month_claim_growth'].isna().astype(int)
-df['month_over_month_claim_growth'] = df['month_over_month_claim_growth'].fillna(0)
+# --- 3.1 Duplicate_ID_count (TOTAL DUPLICATE)
+@FEATURES.register("duplicate_ID_count", inputs=['NIK'], outputs=['duplicate_ID_count'])
+def _duplicate_id_count(df, context):
+    nik_counts = df['NIK'].value_counts()
+    df['duplicate_ID_count'] = (df['NIK'].map(nik_counts) - 1).astype(int)
+    return df
+
+
+# --- 3.1b Duplicate_ID_count_month (ROLLING 30 DAYS) + horizon lain + NIK+diagnosis
+@FEATURES.register(
+    "nik_window_features",
+    inputs=['NIK', 'diagnosis_code', 'claim_date'],
+    outputs=[window_col(t, h) for h in window_horizons()
+             for t in ["duplicate_ID_count_{h}d", "duplicate_diagnosis_count_{h}d"]],
+)
+def _nik_window_features(df, context):
+    window_features = nik_window_features(
+        df, context_index(df, context, "nik"), context_index(df, context, "nik_diagnosis"),
+        window_horizons(),
+    )
+    df[window_features.columns] = window_features
+    return df
 
 
-# --- 3.8 Avg_claim_per_patient
-df['avg_claim_per_patient'] = (
-    df['total_claim_amount'] /
-    df['num_unique_patients_last_30d'].replace(0, np.nan)
+# --- 3.2 Time_between_admissions
+@FEATURES.register(
+    "time_between_admissions", inputs=['NIK', 'claim_date'], outputs=['time_between_admissions']
+)
+def _time_between_admissions(df, context):
+    # klaim di tanggal yang sama: urut provider_id (seperti NIK sort setelah provider sort)
+    diff_days = group_gap_days(df, context, ['NIK'], ['claim_date', 'provider_id'])
+    df['time_between_admissions'] = diff_days.fillna(0)
+    return df
+
+
+# --- 3.3 Num_claims_last_30d_by_provider, 3.4 Num_unique_patients_last_30d (+ horizon lain)
+# (distinct count tidak bisa dari cumsum → pakai sliding multiset, lihat 2c)
+@FEATURES.register(
+    "provider_window_features",
+    inputs=['provider_id', 'NIK', 'claim_date'],
+    outputs=[window_col(t, h) for h in window_horizons()
+             for t in ["num_claims_last_{h}d_by_provider", "num_unique_patients_last_{h}d"]],
 )
+def _provider_window_features(df, context):
+    window_features = provider_window_features(
+        df, context_index(df, context, "provider"), window_horizons(),
+        order=sort_order(df, context, PROVIDER_ORDER),
+    )
+    df[window_features.columns] = window_features
+    return df
+
+
+@FEATURES.register(
+    "provider_claim_rate_vs_peer",
+    inputs=['provider_id', 'total_claim_amount'], outputs=['provider_claim_rate_vs_peer'],
+)
+def _provider_claim_rate(df, context):
+    return add_provider_claim_rate(df, df.groupby('provider_id')['total_claim_amount'].sum())
+
 
-# --- 3.9 Claim_fragmentation_score
-diff_days = (
-    df.groupby(['NIK', 'diagnosis_code'])['claim_date']
-    .diff().dt.days
+@FEATURES.register(
+    "claim_rejection_rate_provider", inputs=[], outputs=['claim_rejection_rate_provider']
 )
+def _rejection_rate(df, context):
+    return add_rejection_rate(df, order=sort_order(df, context, SERIAL_ORDER))
 
-df['claim_fragmentation'] = diff_days.apply(
-    lambda x: 1 if pd.notna(x) and 0 < x <= 7 else 0
-).fillna(0)
 
-df['claim_fragmentation_score'] = diff_days.apply(
-    lambda x: 3 if pd.notna(x) and 0 < x <= 3 else
-              1 if pd.notna(x) and 3 < x <= 7 else
-              0
-).fillna(0)
+@FEATURES.register(
+    "month_over_month_claim_growth",
+    inputs=['provider_id', 'claim_date'], outputs=['year_month'] + MOM_COLS,
+)
+def _month_over_month(df, context):
+    monthly_claims = context_index(df, context, "provider").monthly_counts()
+    monthly_claims.index.name = 'provider_id'
+    return add_month_over_month(df, monthly_claims)
 
 
-# --- 3.10 Service_mix_index (entropy)
-def service_mix_entropy(series):
-    p = series.value_counts(normalize=True)
-    return -np.sum(p * np.log2(p))
+@FEATURES.register(
+    "avg_claim_per_patient",
+    inputs=['total_claim_amount', 'num_unique_patients_last_30d'],
+    outputs=['avg_claim_per_patient'],
+)
+def _avg_claim_per_patient(df, context):
+    return add_avg_claim_per_patient(df)
 
-entropy_map = df.groupby('provider_id')['diagnosis_code'].apply(service_mix_entropy)
-df['service_mix_index'] = df['provider_id'].map(entropy_map)
 
+@FEATURES.register(
+    "claim_fragmentation",
+    inputs=['NIK', 'diagnosis_code', 'provider_id', 'claim_date'], outputs=FRAGMENTATION_COLS,
+)
+def _claim_fragmentation(df, context):
+    # diff per NIK+diagnosis dengan urutan provider_id, claim_date di dalam grup
+    diff_days = group_gap_days(df, context, ['NIK', 'diagnosis_code'], PROVIDER_ORDER)
+    return fragmentation_from_gaps(df, diff_days)
 
 
+@FEATURES.register(
+    "service_mix_index", inputs=['provider_id', 'diagnosis_code'], outputs=['service_mix_index']
+)
+def _service_mix_index(df, context):
+    # urutan kemunculan diagnosis (tie value_counts) mengikuti urutan serial
+    serial = sort_order(df, context, SERIAL_ORDER)
+    entropy_map = service_mix_entropy_map(
+        df['provider_id'].to_numpy()[serial], df['diagnosis_code'].to_numpy()[serial]
+    )
+    df['service_mix_index'] = df['provider_id'].map(entropy_map)
+    return df
+
+
+def feature_output_columns(raw_columns, horizons=None):
+    # urutan kolom output = urutan langkah di versi linear lama
+    horizons = window_horizons() if horizons is None else horizons
+    legacy = [
+        'duplicate_ID_count_month', 'num_claims_last_30d_by_provider',
+        'num_unique_patients_last_30d',
+    ]
+    features = (
+        ['avg_cost_per_procedure', 'diagnosis_cost_ratio', 'verification_delay_days',
+         'duplicate_ID_count', 'duplicate_ID_count_month', 'time_between_admissions',
+         'num_claims_last_30d_by_provider', 'num_unique_patients_last_30d']
+        + [c for c in window_feature_columns(horizons) if c not in legacy]
+        + ['provider_claim_rate_vs_peer', 'claim_rejection_rate_provider', 'year_month']
+        + MOM_COLS
+        + ['avg_claim_per_patient']
+        + FRAGMENTATION_COLS
+        + ['service_mix_index']
+    )
+    return list(raw_columns) + [c for c in features if c not in raw_columns]
+
+
+# === 3️⃣a FITUR LANJUTAN (full history) ===
+def build_features(df, indexes=None, wanted=None):
+    # wanted: daftar kolom / fitur (None = semua fitur di registry)
+    raw_columns = list(df.columns)
+
+    # df tidak diurutkan: setiap langkah memakai permutasi dari sort plan (2d),
+    # satu-satunya take baris penuh adalah urutan output akhir
+    df = df.reset_index(drop=True)
+    context = {"indexes": dict(indexes or {})}
+    df = FEATURES.compute(df, wanted, context)
+
+    columns = [c for c in feature_output_columns(raw_columns) if c in df.columns]
+    return df[columns].take(final_order(df, context)).reset_index(drop=True)
+
+
+# === 3️⃣c FITUR PARALEL (partisi provider_id & NIK di process pool) ===
+# Fitur provider (3.3, 3.4, 3.7, 3.10) independen antar provider, fitur pasien
+# (3.1, 3.1b, 3.2, 3.9) independen antar NIK. Fitur global yang murah
+# (3.5, 3.6, 3.8) tetap di proses utama supaya hasil identik dengan serial.
+PROVIDER_PART_COLS = ['provider_id', 'NIK', 'diagnosis_code', 'claim_date']
+NIK_PART_COLS = ['NIK', 'provider_id', 'diagnosis_code', 'claim_date']
+
+
+def provider_partition_features(part, months, horizons):
+    # part: semua klaim dari sebagian provider, urut provider_id, claim_date
+    provider_index = DailyCountIndex.build(part['provider_id'], part['claim_date'], layout="dense")
+    out = provider_window_features(part, provider_index, horizons)
+
+    # kolom bulan global supaya pct_change sama dengan pivot semua provider
+    monthly_claims = provider_index.monthly_counts().reindex(columns=months, fill_value=0)
+    monthly_claims.index.name = 'provider_id'
+    out[MOM_COLS] = add_month_over_month(part.copy(), monthly_claims)[MOM_COLS]
+
+    out['service_mix_index'] = add_service_mix_index(part.copy())['service_mix_index']
+    return out
+
+
+def nik_partition_features(part, horizons):
+    # part: semua klaim dari sebagian NIK, urut provider_id, claim_date
+    out = nik_window_features(
+        part,
+        DailyCountIndex.build(part['NIK'], part['claim_date'], layout="sparse"),
+        DailyCountIndex.build(
+            part['NIK'] + '|' + part['diagnosis_code'], part['claim_date'], layout="sparse"
+        ),
+        horizons,
+    )
+    out['duplicate_ID_count'] = (part['NIK'].map(part['NIK'].value_counts()) - 1).astype(int)
+    out['time_between_admissions'] = add_time_between_admissions(
+        part.sort_values(["NIK", "claim_date"], kind="mergesort")
+    )['time_between_admissions']
+    out[FRAGMENTATION_COLS] = add_claim_fragmentation(part.copy())[FRAGMENTATION_COLS]
+    return out
+
+
+def partition_providers(df, n_parts):
+    # provider terbesar dulu ke partisi paling ringan (deterministik)
+    sizes = df['provider_id'].value_counts()
+    sizes = sizes.sort_index().sort_values(ascending=False, kind='mergesort')
+    loads = [0] * n_parts
+    part_of = {}
+    for pid, size in sizes.items():
+        k = loads.index(min(loads))
+        part_of[pid] = k
+        loads[k] += size
+    return df['provider_id'].map(part_of).to_numpy()
+
+
+def partition_niks(df, n_parts):
+    return (pd.util.hash_pandas_object(df['NIK'], index=False).to_numpy() % n_parts).astype(int)
+
+
+def build_features_parallel(df, workers):
+    horizons = window_horizons()
+    df = df.sort_values(by=['provider_id', 'claim_date']).reset_index(drop=True)
+    df = add_basic_features(df)
+
+    # urutan baris saat 3.3–3.10 di mode serial (NIK sort lalu provider sort)
+    serial_order = df.sort_values(["NIK", "claim_date"]).sort_values(["provider_id", "claim_date"]).index
+    ordered = df.loc[serial_order]
+    months = pd.PeriodIndex(np.unique(df['claim_date'].dt.to_period('M')), freq='M')
+
+    provider_part = partition_providers(ordered, workers)
+    nik_part = partition_niks(ordered, workers)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        provider_jobs = [
+            pool.submit(provider_partition_features,
+                        ordered.loc[provider_part == k, PROVIDER_PART_COLS], months, horizons)
+            for k in range(workers)
+        ]
+        nik_jobs = [
+            pool.submit(nik_partition_features,
+                        ordered.loc[nik_part == k, NIK_PART_COLS], horizons)
+            for k in range(workers)
+        ]
+        computed = pd.concat([
+            pd.concat([job.result() for job in provider_jobs]),
+            pd.concat([job.result() for job in nik_jobs]),
+        ], axis=1).reindex(df.index)
+
+    # susun ulang dengan urutan langkah & kolom yang sama dengan build_features
+    df['duplicate_ID_count'] = computed['duplicate_ID_count']
+    df = df.sort_values(["NIK", "claim_date"])
+    df['duplicate_ID_count_month'] = computed['duplicate_ID_count_month']
+    df['time_between_admissions'] = computed['time_between_admissions']
+
+    df = df.sort_values(["provider_id", "claim_date"])
+    df['num_claims_last_30d_by_provider'] = computed['num_claims_last_30d_by_provider']
+    df['num_unique_patients_last_30d'] = computed['num_unique_patients_last_30d']
+    extra = [c for c in window_feature_columns(horizons) if c not in df.columns]
+    df = df.join(computed[extra])
+
+    df = add_provider_claim_rate(df, df.groupby('provider_id')['total_claim_amount'].sum())
+    df = add_rejection_rate(df)
+
+    df['year_month'] = df['claim_date'].dt.to_period('M')
+    df[MOM_COLS] = computed[MOM_COLS]
+    df = add_avg_claim_per_patient(df)
+    df[FRAGMENTATION_COLS] = computed[FRAGMENTATION_COLS]
+    df['service_mix_index'] = computed['service_mix_index']
+
+    return df.sort_values(by='claim_date')
+
+
+# === 3️⃣b FITUR INKREMENTAL (hanya klaim baru + entity yang tersentuh) ===
+# FEATURE_FILE hanya di-append. Baris lama yang nilainya ikut berubah:
+#   fitur entity (duplicate_ID_count, provider_claim_rate_vs_peer, MOM_COLS,
+#     service_mix_index: agregat per NIK / provider) → dihitung ulang saat dibaca dari
+#     agregat di feature_state (load_feature_store), tidak disimpan ulang
+#   claim_fragmentation (selisih ke klaim sebelumnya di grup NIK+diagnosis) → hanya
+#     baris yang nilainya benar-benar berubah, ke FEATURE_PATCH_FILE (row_id = baris file)
+STORE_COLS = feature_state.CARRY_COLS + FRAGMENTATION_COLS
+
+
+def build_features_incremental(store, new, state):
+    # store : kolom STORE_COLS dari FEATURE_FILE (+ patch), new : klaim baru (mentah)
+    # Syarat: semua klaim baru lebih baru dari state['last_date'], sehingga
+    # window & time_between_admissions klaim lama tidak berubah.
+    # → (patch fragmentation baris lama, fitur klaim baru)
+    new = new.sort_values(by=['provider_id', 'claim_date']).reset_index(drop=True)
+    new = add_basic_features(new)
+
+    # --- window features: carry (klaim dalam max horizon terakhir) + klaim baru
+    frame = pd.concat(
+        [state['carry'], new[feature_state.CARRY_COLS]], ignore_index=True
+    )
+    window_features = window_feature_frame(frame, build_indexes(frame), window_horizons())
+    window_features = window_features.iloc[len(state['carry']):]
+    window_features.index = new.index
+    new = new.join(window_features)
+
+    touched_provider = new['provider_id'].unique()
+    store_nik = store['NIK'].isin(new['NIK'].unique())
+
+    # --- 3.1 Duplicate_ID_count (baris lama: lihat refresh_entity_features)
+    nik_counts = feature_state.updated_nik_counts(state, new)
+    new['duplicate_ID_count'] = (new['NIK'].map(nik_counts) - 1).astype(int)
+
+    # --- 3.2 Time_between_admissions: klaim sebelumnya diambil dari state
+    new = new.sort_values(["NIK", "claim_date"])
+    prev_date = new.groupby('NIK')['claim_date'].shift()
+    prev_date = prev_date.fillna(new['NIK'].map(state['nik_last_date']))
+    new['time_between_admissions'] = (new['claim_date'] - prev_date).dt.days.fillna(0)
+    new = new.sort_values(["provider_id", "claim_date"])
+
+    # --- 3.5 peer average dari total per provider di state
+    provider_total = feature_state.updated_provider_total(state, new)
+    new = add_provider_claim_rate(new, provider_total)
+    new = add_rejection_rate(new)
+
+    # --- 3.7 provider × bulan dari state
+    monthly_claims = feature_state.updated_monthly_claims(state, new)
+    new = add_month_over_month(new, monthly_claims)
+
+    new = add_avg_claim_per_patient(new)
+
+    # --- 3.9 grup NIK+diagnosis yang tersentuh dihitung ulang bersama history-nya
+    new_groups = (new['NIK'] + '|' + new['diagnosis_code']).unique()
+    store_group = store_nik & (store['NIK'] + '|' + store['diagnosis_code']).isin(new_groups)
+    group_rows = pd.concat([store.loc[store_group], new], keys=['store', 'new'])
+    group_rows = add_claim_fragmentation(
+        group_rows.sort_values(['provider_id', 'claim_date'], kind='mergesort')
+    )
+    in_store = group_rows.index.get_level_values(0) == 'store'
+    recomputed = group_rows.loc[in_store, FRAGMENTATION_COLS].droplevel(0)
+    changed = (recomputed != store.loc[recomputed.index, FRAGMENTATION_COLS]).any(axis=1)
+    patches = recomputed[changed].sort_index()
+    new[FRAGMENTATION_COLS] = group_rows.loc[~in_store, FRAGMENTATION_COLS].droplevel(0)
+
+    # --- 3.10 entropy diperbarui dari N & Σ c·log2(c) per provider (hanya sel yang tersentuh)
+    entropy_stats = feature_state.updated_entropy_stats(state, new)
+    entropy_map = feature_state.entropy_from_stats(entropy_stats.loc[touched_provider])
+    new['service_mix_index'] = new['provider_id'].map(entropy_map)
+
+    return patches, new.sort_values(by='claim_date')
+
+
+def refresh_entity_features(df, state):
+    # fitur entity baris dari NIK / provider yang dapat klaim baru sejak run penuh,
+    # dihitung dari agregat state (satu map / join per kolom, tanpa history klaim)
+    touched_nik = df['NIK'].isin(state['touched_nik']).to_numpy()
+    touched_provider = df['provider_id'].isin(state['touched_provider']).to_numpy()
+    if not (touched_nik.any() or touched_provider.any()):
+        return df
+
+    df.loc[touched_nik, 'duplicate_ID_count'] = (
+        df.loc[touched_nik, 'NIK'].map(state['nik_counts']) - 1
+    ).astype(int)
+
+    # peer average berubah untuk semua provider
+    df = add_provider_claim_rate(df, state['provider_total'])
+
+    rows = df.loc[touched_provider, ['provider_id', 'claim_date']].copy()
+    rows['claim_date'] = pd.to_datetime(rows['claim_date'])
+    df.loc[touched_provider, MOM_COLS] = add_month_over_month(rows, state['monthly_claims'])[MOM_COLS]
+
+    entropy_map = feature_state.entropy_from_stats(state['entropy_stats'].loc[state['touched_provider']])
+    df.loc[touched_provider, 'service_mix_index'] = (
+        df.loc[touched_provider, 'provider_id'].map(entropy_map)
+    )
+    return df
+
+
+def apply_feature_patches(df, path=FEATURE_PATCH_FILE):
+    if os.path.exists(path):
+        patches = pd.read_csv(path).set_index('row_id')
+        df.loc[patches.index, patches.columns] = patches
+    return df
+
+
+def save_feature_patches(patches, path=FEATURE_PATCH_FILE):
+    # patch lama + baru, satu baris per row_id (yang terbaru) → ukuran ≤ baris yang pernah berubah
+    if not len(patches):
+        return
+    patches = patches.rename_axis('row_id').reset_index()
+    if os.path.exists(path):
+        patches = pd.concat([pd.read_csv(path), patches], ignore_index=True)
+    patches.drop_duplicates('row_id', keep='last').sort_values('row_id').to_csv(path, index=False)
+
+
+# kolom baris lama yang bisa berubah setelah klaim baru masuk (patch + refresh entity)
+REFRESHED_COLS = (
+    ['duplicate_ID_count', 'provider_claim_rate_vs_peer'] + MOM_COLS
+    + ['service_mix_index'] + FRAGMENTATION_COLS
+)
 
-# === 4️⃣ SIMPAN ===
-df = df.sort_values(by='claim_date')
-df.to_csv('dummy_claims_with_features.csv', index=False)
 
-# === 5️⃣ OUTPUT ===
-cols_show = [
-    'provider_id', 'NIK', 'duplicate_ID_count', 'duplicate_ID_count_month',
-    'time_between_admissions', 'num_claims_last_30d_by_provider',
-    'num_unique_patients_last_30d', 'provider_claim_rate_vs_peer',
-    'claim_rejection_rate_provider', 'month_over_month_claim_growth',
-    'sudden_spike_flag', 'avg_claim_per_patient',
-    'claim_fragmentation_score', 'service_mix_index'
-]
-print(df['NIK'].head())
-print(df[cols_show].head(10))
+def load_feature_store(path=FEATURE_FILE, columns=None):
+    # FEATURE_FILE + patch baris lama + fitur entity terkini (lihat 3️⃣b);
+    # state dari run lain (jumlah baris beda) → file dipakai apa adanya
+    # columns: hanya baca sebagian kolom (harus memuat feature_state.CARRY_COLS)
+    if columns is None:
+        df = load_claims(path)
+    else:
+        df = pd.read_csv(path, dtype={"NIK": str}, usecols=lambda c: c in columns)
+        df['claim_date'] = pd.to_datetime(df['claim_date'])
+    state = feature_state.load_state()
+    if state is None or state.get('n_rows') != len(df):
+        return df
+    return refresh_entity_features(apply_feature_patches(df), state)
+
+
+# === 4️⃣ SIMPAN + 5️⃣ OUTPUT ===
+def show(df):
+    cols_show = [c for c in [
+        'provider_id', 'NIK', 'duplicate_ID_count', 'duplicate_ID_count_month',
+        'time_between_admissions', 'num_claims_last_30d_by_provider',
+        'num_unique_patients_last_30d', 'provider_claim_rate_vs_peer',
+        'claim_rejection_rate_provider', 'month_over_month_claim_growth',
+        'sudden_spike_flag', 'avg_claim_per_patient',
+        'claim_fragmentation_score', 'service_mix_index'
+    ] if c in df.columns]
+    print(df['NIK'].head())
+    print(df[cols_show].head(10))
+
+
+def run_full(df=None, workers=1, wanted=None):
+    # wanted: hanya sebagian fitur → index, state & patch store fitur tidak disentuh
+    if df is None:
+        df = load_claims(RAW_FILE)
+
+    indexes = build_indexes(df)
+    if wanted is not None:
+        df = build_features(df, indexes, wanted)
+        FEATURES.report_timings()
+        return df
+    save_indexes(indexes)
+
+    if workers > 1:
+        df = build_features_parallel(df, workers)
+    else:
+        df = build_features(df, indexes)
+        FEATURES.report_timings()
+    feature_state.save_state(feature_state.build_state(df, max(window_horizons())))
+    if os.path.exists(FEATURE_PATCH_FILE):
+        os.remove(FEATURE_PATCH_FILE)
+    return df
+
+
+def append_csv(df, path):
+    # kolom mengikuti header file yang sudah ada
+    if os.path.exists(path):
+        df = df.reindex(columns=pd.read_csv(path, nrows=0).columns)
+    df.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+def load_store(state):
+    # baris lama: hanya kolom yang dibutuhkan mode incremental (+ patch)
+    if state is None or not os.path.exists(FEATURE_FILE):
+        return None
+    store = pd.read_csv(FEATURE_FILE, dtype={"NIK": str}, usecols=STORE_COLS)
+    store['claim_date'] = pd.to_datetime(store['claim_date'])
+    return apply_feature_patches(store)
+
+
+def can_run_incremental(state, store, new):
+    if state is None or store is None:
+        return False, "state / file fitur belum ada"
+    if state.get('n_rows') != len(store):
+        # FEATURE_FILE ditulis proses lain (mis. feature_engineering_chunked.py)
+        return False, f"state untuk {state.get('n_rows')} baris, file fitur {len(store)} baris"
+    last_date = max(state['last_date'], store['claim_date'].max())
+    if new['claim_date'].min() <= last_date:
+        # klaim baru mundur tanggal → window klaim lama ikut berubah
+        return False, f"klaim baru tidak lebih baru dari {last_date.date()}"
+    return True, ""
+
+
+def run_incremental(new_path, workers=1):
+    raw_new = pd.read_csv(new_path, dtype={"NIK": str})
+    new = parse_dates(raw_new.copy())
+    state = feature_state.load_state()
+    store = load_store(state)
+
+    ok, reason = can_run_incremental(state, store, new)
+    if not ok:
+        print(f"Incremental tidak bisa ({reason}) → full recompute.")
+        raw = pd.read_csv(RAW_FILE, dtype={"NIK": str}) if os.path.exists(RAW_FILE) else raw_new.iloc[:0]
+        combined = parse_dates(pd.concat(
+            [raw.assign(_is_new=False), raw_new.assign(_is_new=True)], ignore_index=True
+        ))
+        df = run_full(combined, workers)
+        new = df[df['_is_new']].drop(columns='_is_new')
+        df = df.drop(columns='_is_new')
+        n_rows = len(df)
+
+        df.to_csv(FEATURE_FILE, index=False)
+        pd.concat([raw, raw_new], ignore_index=True).to_csv(RAW_FILE, index=False)
+    else:
+        # baris lama tidak ditulis ulang
+        patches, new = build_features_incremental(store, new, state)
+        n_rows = len(store) + len(new)
+
+        append_csv(new, FEATURE_FILE)
+        append_csv(raw_new, RAW_FILE)
+        save_feature_patches(patches)
+        save_indexes(extend_indexes(store, new))
+        # state terakhir: n_rows menandai FEATURE_FILE yang cocok dengan state ini
+        feature_state.save_state(feature_state.update_state(state, new, n_rows))
+        print(f"{len(patches)} baris lama di-patch (claim_fragmentation).")
+
+    new.to_csv(NEW_FEATURE_FILE, index=False)
+
+    print(f"Incremental: {len(new)} klaim baru, total {n_rows} baris fitur.")
+    return new
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feature engineering klaim")
+    parser.add_argument(
+        "--incremental", metavar="NEW_CLAIMS_CSV",
+        help="hanya hitung fitur klaim baru memakai state tersimpan "
+             f"({feature_state.FEATURE_STATE_FILE}); klaim baru ditambahkan ke {RAW_FILE}"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="jumlah proses untuk fitur per provider / per NIK (1 = serial)"
+    )
+    parser.add_argument(
+        "--features", metavar="COL1,COL2",
+        help="hanya hitung kolom/fitur ini beserta dependency-nya "
+             f"(pilihan: {', '.join(FEATURES.features)}); ditulis ke --output"
+    )
+    parser.add_argument(
+        "--output",
+        help=f"file hasil (default: {FEATURE_FILE}; dengan --features: {FEATURE_SUBSET_FILE})"
+    )
+    args = parser.parse_args()
+    wanted = args.features.split(",") if args.features else None
+    output = args.output or (FEATURE_SUBSET_FILE if wanted else FEATURE_FILE)
+    if wanted and os.path.abspath(output) == os.path.abspath(FEATURE_FILE):
+        parser.error(f"--features tidak boleh menimpa {FEATURE_FILE} (store fitur lengkap)")
+
+    if args.incremental:
+        new = run_incremental(args.incremental, args.workers)
+        show(new)
+    else:
+        df = run_full(workers=args.workers, wanted=wanted)
+        df.to_csv(output, index=False)
+        print(f"✔ {output} saved.")
+        show(df)
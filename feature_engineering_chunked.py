@@ -0,0 +1,300 @@
+import argparse
+import math
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from daily_index import DailyCountIndex
+from feature_engineering import (
+    RAW_FILE, FEATURE_FILE, FEATURE_PATCH_FILE, INDEX_FILES, MOM_COLS, NIK_PART_COLS,
+    parse_dates, add_basic_features, add_month_over_month, add_provider_claim_rate,
+    add_avg_claim_per_patient, provider_window_features, nik_partition_features,
+    window_horizons, feature_output_columns,
+)
+from feature_state import FEATURE_STATE_FILE, entropy_from_counts
+
+# ==========================================================
+#   FEATURE ENGINEERING OUT-OF-CORE (file klaim > RAM)
+# ==========================================================
+# Hasil kolom sama dengan feature_engineering.py, tapi data tidak pernah
+# dimuat utuh ke memori:
+#   1. scan input per chunk → partisi di disk per provider_id/bulan
+#      + partisi NIK (hash bucket), sambil mengumpulkan agregat kecil
+#      (total per provider, provider × bulan, provider × diagnosis)
+#   2. per provider, bulan demi bulan: window features dengan carry-over
+#      klaim ≤ max horizon hari dari bulan sebelumnya
+#   3. per bucket NIK: fitur pasien (duplicate, time_between, fragmentation)
+#   4. gabung per provider/bulan, lalu merge terurut claim_date ke output
+#
+# Memori puncak ≈ max(chunk_rows, max_rows per bucket NIK, satu provider-bulan
+# + carry), tidak tergantung total ukuran data.
+# Urutan baris sama dengan mode in-memory: claim_date, lalu provider_id, NIK,
+# urutan input.
+# Catatan: claim_rejection_rate_provider (simulasi acak) dan bit terakhir
+# service_mix_index bisa beda tipis dari mode in-memory. Mode ini tidak
+# membangun feature_state.pkl / daily index; jika output = FEATURE_FILE, file
+# lama dihapus (mode --incremental berikutnya jatuh ke full recompute).
+
+# ============ CONFIG ============
+WORK_DIR = "feature_parts"
+CHUNK_ROWS = 200_000
+MAX_ROWS = 2_000_000
+OUTPUT_ORDER = ['claim_date', 'provider_id', 'NIK', 'row_id']   # = final_order mode in-memory
+
+
+# ============ HELPERS ============
+def _append_csv(df, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_csv(path, mode="a", header=not os.path.exists(path), index=False)
+
+
+def _read_part(path):
+    df = pd.read_csv(path, dtype={"NIK": str})
+    df['claim_date'] = pd.to_datetime(df['claim_date'])
+    if 'service_date' in df.columns:
+        df['service_date'] = pd.to_datetime(df['service_date'])
+    return df
+
+
+def _month_name(period):
+    return str(period)
+
+
+def _nik_bucket(niks, n_buckets):
+    return (pd.util.hash_pandas_object(niks, index=False).to_numpy() % n_buckets).astype(int)
+
+
+# ============ 1. PARTISI ============
+def partition_input(input_path, work_dir, chunk_rows, max_rows):
+    # perkiraan jumlah bucket NIK dari ukuran file & chunk pertama
+    first = pd.read_csv(input_path, dtype={"NIK": str}, nrows=min(chunk_rows, 10_000))
+    bytes_per_row = max(1, len(first.to_csv(index=False)) / max(1, len(first)))
+    est_rows = os.path.getsize(input_path) / bytes_per_row
+    n_buckets = max(1, math.ceil(1.2 * est_rows / max_rows))
+
+    columns = list(first.columns)
+    provider_total = pd.Series(dtype=float)
+    monthly_claims = pd.DataFrame()
+    diagnosis_counts = pd.DataFrame()
+    next_row_id = 0
+
+    for chunk in pd.read_csv(input_path, dtype={"NIK": str}, chunksize=chunk_rows):
+        chunk = add_basic_features(parse_dates(chunk))
+        chunk.insert(0, 'row_id', np.arange(next_row_id, next_row_id + len(chunk)))
+        next_row_id += len(chunk)
+
+        year_month = chunk['claim_date'].dt.to_period('M').rename('year_month')
+        provider_total = provider_total.add(
+            chunk.groupby('provider_id')['total_claim_amount'].sum(), fill_value=0
+        )
+        monthly_claims = monthly_claims.add(
+            chunk.groupby([chunk['provider_id'], year_month]).size().unstack(fill_value=0),
+            fill_value=0,
+        )
+        diagnosis_counts = diagnosis_counts.add(
+            pd.crosstab(chunk['provider_id'], chunk['diagnosis_code']), fill_value=0
+        )
+
+        for (pid, month), part in chunk.groupby([chunk['provider_id'], year_month]):
+            _append_csv(part, os.path.join(work_dir, "rows", str(pid), f"{_month_name(month)}.csv"))
+
+        bucket = _nik_bucket(chunk['NIK'], n_buckets)
+        for b, part in chunk[['row_id'] + NIK_PART_COLS].groupby(bucket):
+            _append_csv(part, os.path.join(work_dir, "nik", f"{b}.csv"))
+
+    monthly_claims = monthly_claims.fillna(0).astype(int).sort_index().sort_index(axis=1)
+    monthly_claims.index.name = 'provider_id'
+    monthly_claims.columns.name = 'year_month'
+    diagnosis_counts = diagnosis_counts.fillna(0).astype(int).sort_index().sort_index(axis=1)
+
+    return {
+        'columns': columns,
+        'n_buckets': n_buckets,
+        'provider_total': provider_total,
+        'monthly_claims': monthly_claims,
+        'diagnosis_counts': diagnosis_counts,
+    }
+
+
+# ============ 2. FITUR PROVIDER (per provider, bulan demi bulan) ============
+def provider_features(work_dir, aggregates, horizons):
+    carry_span = pd.Timedelta(days=max(horizons))
+    entropy_map = entropy_from_counts(aggregates['diagnosis_counts'])
+    carry_cols = ['row_id', 'provider_id', 'NIK', 'diagnosis_code', 'claim_date']
+
+    rows_dir = os.path.join(work_dir, "rows")
+    for pid in sorted(os.listdir(rows_dir)):
+        carry = None
+        for fname in sorted(os.listdir(os.path.join(rows_dir, pid))):
+            month = _read_part(os.path.join(rows_dir, pid, fname))[carry_cols]
+            frame = month if carry is None else pd.concat([carry, month], ignore_index=True)
+
+            provider_index = DailyCountIndex.build(frame['provider_id'], frame['claim_date'], layout="dense")
+            out = provider_window_features(frame, provider_index, horizons).iloc[len(frame) - len(month):]
+            out.index = month.index
+
+            out[MOM_COLS] = add_month_over_month(
+                month[['provider_id', 'claim_date']].copy(), aggregates['monthly_claims']
+            )[MOM_COLS]
+            out['service_mix_index'] = month['provider_id'].map(entropy_map)
+            out.insert(0, 'row_id', month['row_id'])
+            _append_csv(out, os.path.join(work_dir, "provider_out", pid, fname))
+
+            # carry-over: hanya klaim yang masih bisa masuk window bulan berikutnya
+            last_date = frame['claim_date'].max()
+            carry = frame[frame['claim_date'] > last_date - carry_span]
+
+
+# ============ 3. FITUR PASIEN (per bucket NIK) ============
+def nik_features(work_dir, aggregates, horizons):
+    for b in range(aggregates['n_buckets']):
+        path = os.path.join(work_dir, "nik", f"{b}.csv")
+        if not os.path.exists(path):
+            continue
+
+        part = _read_part(path)
+        part = part.sort_values(['provider_id', 'claim_date'], kind='mergesort')
+        out = nik_partition_features(part, horizons)
+        out.insert(0, 'row_id', part['row_id'])
+
+        year_month = part['claim_date'].dt.to_period('M')
+        for (pid, month), piece in out.groupby([part['provider_id'], year_month]):
+            _append_csv(piece, os.path.join(work_dir, "nik_out", str(pid), f"{_month_name(month)}.csv"))
+
+
+# ============ 4. GABUNG + MERGE TERURUT ============
+def assemble(work_dir, aggregates, horizons, seed=42):
+    columns = feature_output_columns(aggregates['columns'], horizons)
+    rows_dir = os.path.join(work_dir, "rows")
+    piece_no = 0
+
+    for pid in sorted(os.listdir(rows_dir)):
+        for fname in sorted(os.listdir(os.path.join(rows_dir, pid))):
+            rows = _read_part(os.path.join(rows_dir, pid, fname))
+            prov = pd.read_csv(os.path.join(work_dir, "provider_out", pid, fname))
+            nik = pd.read_csv(os.path.join(work_dir, "nik_out", pid, fname))
+            df = rows.merge(prov, on='row_id').merge(nik, on='row_id')
+
+            df = add_provider_claim_rate(df, aggregates['provider_total'])
+            rng = np.random.RandomState(seed + piece_no)   # simulasi, deterministik per partisi
+            df['claim_rejection_rate_provider'] = rng.uniform(0.02, 0.15, size=len(df))
+            df['year_month'] = df['claim_date'].dt.to_period('M')
+            df = add_avg_claim_per_patient(df)
+
+            df = df.sort_values(OUTPUT_ORDER, kind='mergesort')
+            month = fname[:-len(".csv")]
+            _append_csv(df[['row_id'] + columns], os.path.join(work_dir, "assembled", month, f"{pid}.csv"))
+            piece_no += 1
+    return columns
+
+
+def merge_sorted(work_dir, output_path, columns, chunk_rows):
+    # k-way merge per bulan: tiap potongan provider sudah urut claim_date,
+    # keluarkan semua baris < watermark (tanggal minimum dari ujung buffer);
+    # baris di tanggal watermark ditahan sampai semua potongan melewatinya
+    # supaya tie satu tanggal tetap urut OUTPUT_ORDER
+    if os.path.exists(output_path):
+        os.remove(output_path)
+
+    assembled_dir = os.path.join(work_dir, "assembled")
+    for month in sorted(os.listdir(assembled_dir)):
+        paths = sorted(os.listdir(os.path.join(assembled_dir, month)))
+        readers = [
+            pd.read_csv(os.path.join(assembled_dir, month, p), dtype={"NIK": str},
+                        chunksize=max(1, chunk_rows // max(1, len(paths))))
+            for p in paths
+        ]
+        buffers = [None] * len(readers)
+
+        while True:
+            for i, reader in enumerate(readers):
+                if reader is not None and (buffers[i] is None or buffers[i].empty):
+                    nxt = next(reader, None)
+                    if nxt is None:
+                        readers[i] = None
+                        buffers[i] = None
+                    else:
+                        nxt['claim_date'] = pd.to_datetime(nxt['claim_date'])
+                        buffers[i] = nxt
+
+            active = [(i, b) for i, b in enumerate(buffers) if b is not None and not b.empty]
+            if not active:
+                break
+
+            # potongan yang masih punya chunk berikutnya membatasi watermark
+            pending = [b['claim_date'].iloc[-1] for i, b in active if readers[i] is not None]
+            watermark = min(pending) if pending else None
+
+            emit = []
+            for i, b in active:
+                if watermark is None:
+                    emit.append(b)
+                    buffers[i] = b.iloc[:0]
+                    continue
+                done = b['claim_date'] < watermark
+                emit.append(b[done])
+                buffers[i] = b[~done]
+
+            out = pd.concat(emit)
+            if out.empty:
+                # sisa buffer semua di tanggal watermark → tambah chunk potongan penentunya
+                for i, b in active:
+                    if readers[i] is not None and b['claim_date'].iloc[-1] == watermark:
+                        nxt = next(readers[i], None)
+                        if nxt is None:
+                            readers[i] = None
+                        else:
+                            nxt['claim_date'] = pd.to_datetime(nxt['claim_date'])
+                            buffers[i] = pd.concat([b, nxt])
+                continue
+            out = out.sort_values(OUTPUT_ORDER, kind='mergesort')
+            _append_csv(out[columns], output_path)
+
+
+# ============ MAIN ============
+def run_chunked(input_path=RAW_FILE, output_path=FEATURE_FILE, work_dir=WORK_DIR,
+                chunk_rows=CHUNK_ROWS, max_rows=MAX_ROWS, keep_parts=False):
+    horizons = window_horizons()
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+
+    print("1/4 Partisi input ...")
+    aggregates = partition_input(input_path, work_dir, chunk_rows, max_rows)
+    print(f"    {aggregates['n_buckets']} bucket NIK")
+
+    print("2/4 Fitur provider ...")
+    provider_features(work_dir, aggregates, horizons)
+
+    print("3/4 Fitur pasien ...")
+    nik_features(work_dir, aggregates, horizons)
+
+    print("4/4 Gabung & tulis output ...")
+    columns = assemble(work_dir, aggregates, horizons)
+    merge_sorted(work_dir, output_path, columns, chunk_rows)
+
+    if not keep_parts:
+        shutil.rmtree(work_dir)
+    if os.path.abspath(output_path) == os.path.abspath(FEATURE_FILE):
+        # patch (row_id), state & daily index mengacu ke file fitur lama
+        for path in [FEATURE_PATCH_FILE, FEATURE_STATE_FILE, *INDEX_FILES.values()]:
+            if os.path.exists(path):
+                os.remove(path)
+    print(f"✔ Fitur disimpan → {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Feature engineering out-of-core (chunked)")
+    parser.add_argument("--input", default=RAW_FILE)
+    parser.add_argument("--output", default=FEATURE_FILE)
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help="baris per chunk saat membaca input / menulis output")
+    parser.add_argument("--max-rows", type=int, default=MAX_ROWS,
+                        help="target baris per bucket NIK (batas memori)")
+    parser.add_argument("--keep-parts", action="store_true")
+    args = parser.parse_args()
+
+    run_chunked(args.input, args.output, args.work_dir,
+                args.chunk_rows, args.max_rows, args.keep_parts)
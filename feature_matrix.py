@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import label_state
+from feature_engineering import FEATURE_FILE, FEATURE_PATCH_FILE
+from feature_state import FEATURE_STATE_FILE
+from model_training import MODEL_FEATURES, load_training_data
+
+# ==========================================================
+#   CACHE MATRIKS FITUR (float32 .npy, di-memmap lintas script)
+# ==========================================================
+# Satu direktori per kunci = hash(isi file sumber + daftar fitur):
+#   feature_cache/<kunci>/X.npy          float32, C-contiguous (baris × fitur)
+#   feature_cache/<kunci>/y.npy          kode label (int8), kelas di manifest
+#   feature_cache/<kunci>/manifest.json  fitur, kelas, jumlah baris, sumber
+# Script training / tuning / SHAP memanggil load_matrix(): jika kunci sudah ada
+# X dibuka dengan mmap_mode='r' (halaman dibagi antar proses, tanpa parse CSV).
+# Digest file sumber disimpan per (path, size, mtime) supaya file yang tidak
+# berubah tidak perlu dibaca ulang untuk menghitung kunci; entri file yang sudah
+# berubah / hilang dibuang. Setelah kunci baru dibangun hanya MAX_CACHE_KEYS
+# kunci terbaru yang disimpan.
+
+CACHE_DIR = "feature_cache"
+DIGEST_FILE = os.path.join(CACHE_DIR, "digests.json")
+HASH_BLOCK = 1 << 20
+MAX_CACHE_KEYS = 3
+
+
+def training_sources():
+    # file yang menentukan isi read_training() (kolom fitur terkini dari store fitur)
+    paths = [label_state.TRAINING_FILE, label_state.HOLDOUT_FILE,
+             label_state.LABEL_PATCH_FILE, label_state.LABEL_STATE_FILE,
+             FEATURE_FILE, FEATURE_PATCH_FILE, FEATURE_STATE_FILE]
+    return [p for p in paths if os.path.exists(p)]
+
+
+# ============ KUNCI ============
+def file_stamp(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def file_digest(path, known=None):
+    stamp = file_stamp(path)
+    if known is not None and stamp in known:
+        return known[stamp]
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    if known is not None:
+        known[stamp] = digest
+    return digest
+
+
+def _load_digests():
+    if not os.path.exists(DIGEST_FILE):
+        return {}
+    with open(DIGEST_FILE) as f:
+        return json.load(f)
+
+
+def cache_key(sources, features):
+    known = _load_digests()
+    before = len(known)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps(list(features)).encode())
+    for path in sources:
+        h.update(file_digest(path, known).encode())
+    if len(known) != before:
+        _save_digests(known)
+    return h.hexdigest()
+
+
+def _save_digests(known):
+    # hanya stamp yang masih sama dengan file di disk → satu entri per file
+    current = {}
+    for stamp, digest in known.items():
+        path = stamp.rsplit("|", 2)[0]
+        if os.path.exists(path) and file_stamp(path) == stamp:
+            current[stamp] = digest
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(DIGEST_FILE, "w") as f:
+        json.dump(current, f)
+
+
+# ============ BUILD / LOAD ============
+def build_matrix(path, X, y, features, sources):
+    # tulis ke direktori sementara lalu rename → pembaca tidak pernah melihat cache setengah jadi
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=CACHE_DIR)
+    codes, classes = pd.factorize(np.asarray(y), sort=True)
+    np.save(os.path.join(tmp, "X.npy"), np.ascontiguousarray(X, dtype=np.float32))
+    np.save(os.path.join(tmp, "y.npy"), codes.astype(np.int8))
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump({
+            'features': list(features),
+            'classes': [str(c) for c in classes],
+            'n_rows': int(len(codes)),
+            'sources': list(sources),
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }, f)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp)   # proses lain sudah menulis kunci yang sama
+
+
+def evict_matrices(keep, max_keys=MAX_CACHE_KEYS):
+    # kunci lama (mtime terlama) dihapus; direktori tmp* = build yang sedang jalan
+    keys = [
+        os.path.join(CACHE_DIR, name) for name in os.listdir(CACHE_DIR)
+        if not name.startswith("tmp") and os.path.isdir(os.path.join(CACHE_DIR, name))
+    ]
+    keys.sort(key=os.path.getmtime, reverse=True)
+    stale = [p for p in keys if p != keep][max(max_keys - 1, 0):]
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def load_matrix(features=None, sources=None, loader=None):
+    # → (X float32 memmap, y label, manifest)
+    features = list(features or MODEL_FEATURES)
+    sources = training_sources() if sources is None else sources
+    path = os.path.join(CACHE_DIR, cache_key(sources, features))
+
+    if not os.path.exists(path):
+        X, y = (loader or load_training_data)(features)
+        build_matrix(path, X[features], y, features, sources)
+        evict_matrices(path)
+
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    X = np.load(os.path.join(path, "X.npy"), mmap_mode="r")
+    y = np.asarray(manifest['classes'], dtype=object)[np.load(os.path.join(path, "y.npy"))]
+    return X, y, manifest
+
+
+def load_frame(features=None, sources=None, loader=None):
+    # DataFrame tanpa salinan di atas memmap (nama kolom ikut tersimpan di model)
+    X, y, manifest = load_matrix(features, sources, loader)
+    return pd.DataFrame(X, columns=manifest['features'], copy=False), pd.Series(y, name='fraud_label')
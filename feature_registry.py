@@ -0,0 +1,118 @@
+import time
+
+# ==========================================================
+#            FEATURE REGISTRY (DAG input → output)
+# ==========================================================
+# Setiap fitur mendaftarkan kolom input & output-nya. Pemanggil cukup minta
+# daftar kolom/fitur; hanya langkah upstream yang dibutuhkan yang dijalankan,
+# dengan urutan topologis, dan waktu tiap fitur dicatat.
+
+
+class Feature:
+
+    def __init__(self, name, inputs, outputs, func):
+        self.name = name
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.func = func
+
+
+class FeatureRegistry:
+
+    def __init__(self):
+        self.features = {}
+        self.producer = {}      # kolom output → nama fitur
+        self.last_timings = {}
+
+    def register(self, name, inputs, outputs):
+        # decorator: func(df, context) -> df
+        def wrap(func):
+            for col in outputs:
+                if col in self.producer:
+                    raise ValueError(f"Kolom {col} sudah diproduksi oleh {self.producer[col]}")
+                self.producer[col] = name
+            self.features[name] = Feature(name, inputs, outputs, func)
+            return func
+        return wrap
+
+    def outputs(self, names=None):
+        names = self.features if names is None else names
+        return [col for name in names for col in self.features[name].outputs]
+
+    # ============ PLAN ============
+    def resolve(self, wanted, available=()):
+        # wanted: nama fitur atau nama kolom; available: kolom yang sudah ada
+        available = set(available)
+        order, visiting = [], set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency melingkar di fitur {name}")
+            visiting.add(name)
+            for col in self.features[name].inputs:
+                if col in self.producer and col not in available:
+                    visit(self.producer[col])
+            visiting.discard(name)
+            order.append(name)
+
+        for item in wanted:
+            if item in available:
+                continue
+            if item in self.producer:
+                visit(self.producer[item])
+            elif item in self.features:
+                if not set(self.features[item].outputs) <= available:
+                    visit(item)
+            else:
+                raise KeyError(f"Fitur / kolom tidak dikenal: {item}")
+
+        # urutan pendaftaran dipertahankan selama tetap topologis
+        rank = {name: i for i, name in enumerate(self.features)}
+        return _stable_topological(order, rank, self)
+
+    # ============ EXECUTE ============
+    def compute(self, df, wanted=None, context=None, missing_only=False):
+        wanted = list(self.features) if wanted is None else wanted
+        context = {} if context is None else context
+        plan = self.resolve(wanted, df.columns if missing_only else ())
+
+        self.last_timings = {}
+        for name in plan:
+            start = time.perf_counter()
+            df = self.features[name].func(df, context)
+            self.last_timings[name] = time.perf_counter() - start
+        return df
+
+    def ensure(self, df, columns, context=None):
+        # hitung hanya kolom yang belum ada di df (beserta upstream-nya)
+        return self.compute(df, columns, context, missing_only=True)
+
+    def report_timings(self):
+        total = sum(self.last_timings.values())
+        print("=== Feature timing ===")
+        for name, sec in sorted(self.last_timings.items(), key=lambda x: -x[1]):
+            print(f"{name:<32} {sec:8.3f}s")
+        print(f"{'TOTAL':<32} {total:8.3f}s")
+
+
+def _stable_topological(names, rank, registry):
+    # Kahn's algorithm, prioritas = urutan pendaftaran
+    names = set(names)
+    deps = {
+        n: {registry.producer[c] for c in registry.features[n].inputs
+            if c in registry.producer and registry.producer[c] in names} - {n}
+        for n in names
+    }
+    order = []
+    while deps:
+        ready = sorted((n for n, d in deps.items() if not d), key=rank.get)
+        if not ready:
+            raise ValueError("Dependency melingkar di registry fitur")
+        nxt = ready[0]
+        order.append(nxt)
+        del deps[nxt]
+        for d in deps.values():
+            d.discard(nxt)
+    return order
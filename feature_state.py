@@ -0,0 +1,159 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+#     STATE FEATURE ENGINEERING (untuk mode --incremental)
+# ==========================================================
+# Disimpan setiap kali feature_engineering.py jalan:
+#   carry            : klaim dalam max horizon terakhir (untuk window features)
+#   nik_counts       : jumlah klaim per NIK            (duplicate_ID_count)
+#   nik_last_date    : klaim terakhir per NIK          (time_between_admissions)
+#   provider_total   : total nominal per provider      (provider_claim_rate_vs_peer)
+#   monthly_claims   : provider × bulan                (month_over_month_claim_growth)
+#   diagnosis_counts : provider × diagnosis_code       (service_mix_index)
+#   entropy_stats    : per provider N & Σ c·log2(c)    (service_mix_index inkremental)
+#   touched_nik / touched_provider : entity yang dapat klaim baru sejak run penuh
+#                      terakhir → fitur entity baris lama dihitung ulang saat dibaca
+#   n_rows           : jumlah baris FEATURE_FILE yang sesuai dengan state ini
+
+FEATURE_STATE_FILE = "feature_state.pkl"
+CARRY_COLS = ['NIK', 'provider_id', 'diagnosis_code', 'claim_date']
+
+
+def _monthly(df):
+    year_month = df['claim_date'].dt.to_period('M').rename('year_month')
+    return df.groupby([df['provider_id'], year_month]).size().unstack(fill_value=0)
+
+
+def _carry(df, last_date, carry_days):
+    recent = df['claim_date'] > last_date - pd.Timedelta(days=carry_days)
+    return df.loc[recent, CARRY_COLS].reset_index(drop=True)
+
+
+def build_state(df, carry_days):
+    last_date = df['claim_date'].max()
+    diagnosis_counts = pd.crosstab(df['provider_id'], df['diagnosis_code'])
+    return {
+        'carry_days': carry_days,
+        'last_date': last_date,
+        'carry': _carry(df, last_date, carry_days),
+        'nik_counts': df['NIK'].value_counts(),
+        'nik_last_date': df.groupby('NIK')['claim_date'].max(),
+        'provider_total': df.groupby('provider_id')['total_claim_amount'].sum(),
+        'monthly_claims': _monthly(df),
+        'diagnosis_counts': diagnosis_counts,
+        'entropy_stats': entropy_stats(diagnosis_counts),
+        'touched_nik': pd.Index([], dtype=object),
+        'touched_provider': pd.Index([], dtype=object),
+        'n_rows': len(df),
+    }
+
+
+# ============ UPDATE (state lama + klaim baru) ============
+def updated_nik_counts(state, new):
+    return state['nik_counts'].add(new['NIK'].value_counts(), fill_value=0).astype(int)
+
+
+def updated_provider_total(state, new):
+    new_total = new.groupby('provider_id')['total_claim_amount'].sum()
+    return state['provider_total'].add(new_total, fill_value=0)
+
+
+def updated_monthly_claims(state, new):
+    monthly = state['monthly_claims'].add(_monthly(new), fill_value=0).fillna(0).astype(int)
+    return monthly.sort_index().sort_index(axis=1)
+
+
+def updated_diagnosis_counts(state, new):
+    new_counts = pd.crosstab(new['provider_id'], new['diagnosis_code'])
+    counts = state['diagnosis_counts'].add(new_counts, fill_value=0).fillna(0).astype(int)
+    return counts.sort_index().sort_index(axis=1)
+
+
+def update_state(state, new, n_rows):
+    last_date = max(state['last_date'], new['claim_date'].max())
+    carry = pd.concat([state['carry'], new[CARRY_COLS]], ignore_index=True)
+    return {
+        'carry_days': state['carry_days'],
+        'last_date': last_date,
+        'carry': _carry(carry, last_date, state['carry_days']),
+        'nik_counts': updated_nik_counts(state, new),
+        'nik_last_date': pd.concat(
+            [state['nik_last_date'], new.groupby('NIK')['claim_date'].max()]
+        ).groupby(level=0).max(),
+        'provider_total': updated_provider_total(state, new),
+        'monthly_claims': updated_monthly_claims(state, new),
+        'diagnosis_counts': updated_diagnosis_counts(state, new),
+        'entropy_stats': updated_entropy_stats(state, new),
+        'touched_nik': state.get('touched_nik', pd.Index([])).union(pd.Index(new['NIK'].unique())),
+        'touched_provider': state.get('touched_provider', pd.Index([])).union(
+            pd.Index(new['provider_id'].unique())
+        ),
+        'n_rows': n_rows,
+    }
+
+
+# ============ ENTROPY ============
+def entropy_from_counts(counts):
+    # entropy (bit) per baris tabel jumlah provider × diagnosis
+    c = counts.to_numpy(dtype=float)
+    p = c / c.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(p > 0, p * np.log2(p), 0.0)
+    return pd.Series(-terms.sum(axis=1), index=counts.index)
+
+
+# H = log2(N) − S/N  dengan  N = Σ c,  S = Σ c·log2(c)
+# → klaim baru cukup mengubah N & S untuk sel (provider, diagnosis) yang
+#   tersentuh, tanpa menghitung ulang seluruh history provider.
+def _xlog2x(c):
+    c = np.asarray(c, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(c > 0, c * np.log2(c), 0.0)
+
+
+def entropy_stats(counts):
+    c = counts.to_numpy(dtype=float)
+    return pd.DataFrame(
+        {'total': c.sum(axis=1), 'xlogx': _xlog2x(c).sum(axis=1)}, index=counts.index
+    )
+
+
+def updated_entropy_stats(state, new):
+    counts = state['diagnosis_counts']
+    stats = state.get('entropy_stats')
+    if stats is None:   # state lama (sebelum entropy_stats disimpan)
+        stats = entropy_stats(counts)
+
+    added = new.groupby(['provider_id', 'diagnosis_code']).size()
+    providers = added.index.get_level_values(0)
+    rows = counts.index.get_indexer(providers)
+    cols = counts.columns.get_indexer(added.index.get_level_values(1))
+    known = (rows >= 0) & (cols >= 0)
+    old = np.zeros(len(added))
+    old[known] = counts.to_numpy()[rows[known], cols[known]]
+
+    delta = pd.DataFrame({
+        'total': added.to_numpy(dtype=float),
+        'xlogx': _xlog2x(old + added.to_numpy()) - _xlog2x(old),
+    }, index=providers).groupby(level=0).sum()
+    return stats.add(delta, fill_value=0.0).sort_index()
+
+
+def entropy_from_stats(stats):
+    n = stats['total']
+    return np.log2(n) - stats['xlogx'] / n
+
+
+# ============ PERSIST ============
+def save_state(state, path=FEATURE_STATE_FILE):
+    joblib.dump(state, path)
+
+
+def load_state(path=FEATURE_STATE_FILE):
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
@@ -1,11 +1,22 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
-df = pd.read_csv("dummy_claims_with_features.csv", dtype={"NIK": str})
+from feature_engineering import FEATURES, load_feature_store
+from rule_engine import RuleSet, RULE_FILE
+from rule_hits import RuleHits, RULE_HITS_FILE
+from rule_report import build_report, save_report, report_summary, RULE_REPORT_FILE
+import label_state
+
+# ============ CONFIG ============
+FEATURE_FILE = "dummy_claims_with_features.csv"
+TRAINING_FILE = label_state.TRAINING_FILE
+HOLDOUT_FILE = label_state.HOLDOUT_FILE
+NEW_CLAIMS_COUNT = 30  # fix 30 klaim baru
 
-# Convert tanggal → datetime wajib
-df['claim_date'] = pd.to_datetime(df['claim_date'])
-df['service_date'] = pd.to_datetime(df['service_date'])
 diagnosis_groups = {
     "ISPA": ['J00', 'J18.9', 'J45.9'],
     "Metabolic": ['E11', 'E66.9'],
@@ -18,45 +29,17 @@ diagnosis_groups = {
     "General": ['R50.9', 'Z03.8', 'Z00.0', 'R10.4']
 }
 
-df['provider_id_default'] = df.groupby('NIK')['provider_id'].transform('first')
 
-# ==========================================================
-#                HARD TUNING FRAUD SCORING
-# ==========================================================
+def load_features(path, rules):
+    # file fitur + patch baris lama + fitur entity terkini (tanggal sudah datetime)
+    df = load_feature_store(path)
+
+    # Fitur yang dipakai rule; kolom yang belum ada di file dihitung lewat registry
+    df = FEATURES.ensure(df, [c for c in rules.columns if c in FEATURES.producer])
+    if FEATURES.last_timings:
+        FEATURES.report_timings()
+    return df
 
-df['fraud_score'] = 0
-
-# === CRITICAL RULES (12–20) ===
-df['fraud_score'] += np.where(df['biometric_flag'] == 0, 20, 0)
-df['fraud_score'] += np.where(df['NIK_valid'] == 0, 15, 0)
-df['fraud_score'] += np.where(df['duplicate_ID_count_month'] > 1, 14, 0)
-df['fraud_score'] += np.where(df['diagnosis_cost_ratio'] > 3.0, 14, 0)
-df['fraud_score'] += np.where(df['total_claim_amount'] > df['tarif_standar_diagnosis'] * 2.5, 16, 0)
-
-# === MAJOR RULES (6–10) ===
-df['fraud_score'] += np.where(df['duplicate_ID_count'] > 2, 8, 0)
-df['fraud_score'] += np.where(df['claim_fragmentation_score'] >= 2, 10, 0)
-df['fraud_score'] += np.where(df['diagnosis_cost_ratio'] > 2.0, 9, 0)
-df['fraud_score'] += np.where(df['avg_claim_per_patient'] > 5_000_000, 10, 0)
-df['fraud_score'] += np.where(df['month_over_month_claim_growth'] > 1.5, 8, 0)
-df['fraud_score'] += np.where(df['service_mix_index'] < 0.55, 8, 0)
-
-# Provider anomaly
-df['fraud_score'] += np.where(df['provider_id'] != df['provider_id_default'], 6, 0)
-
-# === MINOR RULES (2–5) ===
-df['fraud_score'] += np.where(df['time_between_admissions'] < 5, 5, 0)
-df['fraud_score'] += np.where(
-    (df['diagnosis_cost_ratio'] > 1.1) & (df['diagnosis_cost_ratio'] <= 2.0), 4, 0
-)
-df['fraud_score'] += np.where(
-    (df['verification_delay_days'] > 30), 4, 0
-)
-df['fraud_score'] += np.where(df['claim_date'].dt.weekday == 6, 3, 0)
-df['fraud_score'] += np.where(
-    (df['claim_date'] - df['service_date']).dt.days <= 1, 3, 0
-)
-df['fraud_score'] += np.where(df['sudden_spike_flag'] == 1, 3, 0)
 
 # ==========================================================
 #              LOS anomaly (major category)
@@ -74,81 +57,348 @@ def get_diag_group(code):
             return group
     return "General"
 
-def los_anomaly_flag(row):
-    group = get_diag_group(row['diagnosis_code'])
-    lo, hi = los_normal_map.get(group, (0, 3))
-    return 1 if row['length_of_stay'] < lo or row['length_of_stay'] > hi else 0
+def los_anomaly_flag(diagnosis_code, length_of_stay):
+    # lookup (lo, hi) sekali per diagnosis_code unik (kode kategori → array kecil),
+    # lalu satu perbandingan vektor untuk semua baris.
+    # slot terakhir dipakai kode -1 (diagnosis kosong) → grup General
+    diag = pd.Categorical(diagnosis_code)
+    groups = [get_diag_group(code) for code in diag.categories] + ["General"]
+    los_lo = np.array([los_normal_map.get(g, (0, 3))[0] for g in groups])
+    los_hi = np.array([los_normal_map.get(g, (0, 3))[1] for g in groups])
+
+    los = np.asarray(length_of_stay, dtype=float)
+    codes = diag.codes
+    return ((los < los_lo[codes]) | (los > los_hi[codes])).astype(int)
 
-df['los_anomaly_flag'] = df.apply(los_anomaly_flag, axis=1)
-df['fraud_score'] += df['los_anomaly_flag'] * 10  # MAJOR
 
 # ==========================================================
-#        PROVIDER BALANCE SCORE (Critical but scaled)
+#        KOLOM TURUNAN (provider default, LOS, provider balance)
 # ==========================================================
 
-def provider_balance_score(nik):
-    providers = df.loc[df['NIK'] == nik, 'provider_id']
-    counts = providers.value_counts()
-    if len(counts) == 1:
-        return 0
-    total = counts.sum()
-    top_ratio = counts.max() / total
-
-    if top_ratio <= 0.55:
-        return 12
-    elif top_ratio <= 0.75:
-        return 6
-    else:
-        return 2
+def add_derived_columns(df, provider_default, balance_scores):
+    df['provider_id_default'] = df['NIK'].map(provider_default)
+    df['los_anomaly_flag'] = los_anomaly_flag(df['diagnosis_code'], df['length_of_stay'])
+    df['provider_balance_score'] = df['NIK'].map(balance_scores).fillna(0).astype(int)
+    return df
+
+
+def rule_extra_columns(df):
+    # Kolom turunan tanggal tidak ikut disimpan; dihitung per chunk saat rule
+    # dievaluasi (tanpa array int64 sepanjang data).
+    claim_date = df['claim_date'].to_numpy()
+    service_date = df['service_date'].to_numpy()
+    day = np.timedelta64(1, 'D')
+
+    def claim_weekday(start, end):
+        # 1970-01-01 = Kamis → (hari sejak epoch + 3) mod 7, Senin = 0; NaT → -1
+        dates = claim_date[start:end]
+        weekday = (dates.astype('datetime64[D]').astype(np.int64) + 3) % 7
+        return np.where(np.isnat(dates), -1, weekday)
+
+    def claim_service_gap_days(start, end):
+        # NaT → NaN (tidak memenuhi perbandingan apa pun, sama seperti .dt.days)
+        gap = claim_date[start:end] - service_date[start:end]
+        with np.errstate(invalid='ignore'):
+            return np.where(np.isnat(gap), np.nan, gap // day)
+
+    return {'claim_weekday': claim_weekday, 'claim_service_gap_days': claim_service_gap_days}
+
+
+def write_rule_report(rules, rule_hits, df, timings, mode):
+    # statistik per rule atas klaim yang dievaluasi di run ini
+    report = build_report(
+        rules, rule_hits, df['provider_id'], df['claim_date'], df['fraud_label'], timings, mode
+    )
+    save_report(report)
+    print(f"=== Rule report ({report['eval_ms_total']:.1f} ms evaluasi) → {RULE_REPORT_FILE} ===")
+    with pd.option_context('display.width', 200):
+        print(report_summary(report).sort_values('hit_count', ascending=False, kind='mergesort'))
+    if report['dead_rules']:
+        print(f"Rule tidak pernah kena: {report['dead_rules']}")
 
-df['provider_balance_score'] = df['NIK'].map(provider_balance_score)
-df['fraud_score'] += df['provider_balance_score']
 
 # ==========================================================
-#               HARD TUNING NORMALIZATION
+#              EVALUASI RULE (kolom turunan + matriks hit)
 # ==========================================================
 
-# Step 1: clip max to avoid outlier explosion
-df['fraud_score'] = df['fraud_score'].clip(upper=100)
+def evaluate_claims(df, rules):
+    # kolom turunan NIK-lokal + matriks hit; dipakai langsung atau per partisi NIK
+    provider_default = df.groupby('NIK')['provider_id'].first()
+
+    # Satu tabel NIK × provider (groupby size) → skor per NIK dengan max/sum per grup
+    nik_provider_counts = label_state.nik_provider_counts(df)
+    balance_scores = label_state.provider_balance_scores(nik_provider_counts)
+    df = add_derived_columns(df, provider_default, balance_scores)
+
+    timings = np.zeros(len(rules.ids))
+    rule_hits = rules.evaluate(df, extra=rule_extra_columns(df), timings=timings)
+    return df, rule_hits, timings, nik_provider_counts, provider_default
 
-# Step 2: optional scaling → normalizing to 0–100
-df['fraud_score'] = (df['fraud_score'] / df['fraud_score'].max()) * 100
-df['fraud_score'] = df['fraud_score'].round(2)
 
 # ==========================================================
-#                   FINAL LABELING
+#     LABELING PARALEL PER PARTISI NIK (process pool)
 # ==========================================================
+# Semua rule row-local kecuali provider_id_default & provider_balance_score
+# (NIK-local) → partisi berdasarkan hash NIK bisa dievaluasi terpisah.
+# Worker hanya mengembalikan matriks hit + kolom turunan; normalisasi
+# (max skor global / kalibrasi) dan split tetap sekali di proses utama.
+
+DERIVED_COLS = ['provider_id_default', 'los_anomaly_flag', 'provider_balance_score']
+_WORKER = {}
+
+
+def partition_by_nik(nik, n_parts):
+    # hash stabil (tidak bergantung PYTHONHASHSEED) → posisi baris per partisi
+    part = pd.util.hash_array(np.asarray(nik, dtype=object)) % n_parts
+    return [np.flatnonzero(part == p) for p in range(n_parts)]
 
-def assign_label(score):
-    if score >= 66:
-        return "HIGH"
-    elif score >= 40:
-        return "MEDIUM"
-    else:
-        return "NORMAL"
 
-df['fraud_label'] = df['fraud_score'].apply(assign_label)
+def _init_label_worker(spec):
+    # fungsi rule hasil kompilasi tidak bisa dipickle → dikompilasi ulang di worker
+    rules, clip, thresholds, default_label = spec
+    _WORKER['rules'] = RuleSet(rules, clip, thresholds, default_label)
 
 
+def _label_partition(part):
+    part, rule_hits, timings, counts, provider_default = evaluate_claims(part, _WORKER['rules'])
+    return part[DERIVED_COLS], rule_hits, timings, counts, provider_default
 
-# SPLIT DATA
-new_claims_count = 30  # fix 30 klaim baru
 
-# Pastikan total row cukup
-if len(df) <= new_claims_count:
-    raise ValueError("Data kurang untuk split klaim baru")
+def evaluate_claims_parallel(df, rules, workers):
+    input_cols = list(dict.fromkeys(
+        ['NIK', 'provider_id', 'diagnosis_code', 'length_of_stay', 'claim_date', 'service_date']
+        + [c for c in rules.columns if c in df.columns and c not in DERIVED_COLS]
+    ))
+    positions = [p for p in partition_by_nik(df['NIK'], workers) if len(p)]
+    parts = (df[input_cols].iloc[p] for p in positions)
 
-training_df = df.iloc[:-new_claims_count].copy()
-new_claims_df = df.iloc[-new_claims_count:].copy()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_label_worker,
+                             initargs=((rules.rules, rules.clip, dict(rules.thresholds),
+                                        rules.default_label),)) as pool:
+        results = list(pool.map(_label_partition, parts))
 
-print(f"Total data: {len(df)}")
-print(f"Training: {len(training_df)}")
-print(f"New claims: {len(new_claims_df)}")
+    rule_hits = np.empty((len(df), len(rules.ids)), dtype=np.uint8)
+    for p, (_, hits, _, _, _) in zip(positions, results):
+        rule_hits[p] = hits
+    derived = pd.concat([r[0].set_axis(p) for p, r in zip(positions, results)]).sort_index()
+    for col in DERIVED_COLS:
+        df[col] = derived[col].to_numpy()
+
+    timings = np.sum([r[2] for r in results], axis=0)
+    nik_provider_counts = pd.concat([r[3] for r in results]).sort_index()
+    provider_default = pd.concat([r[4] for r in results]).sort_index()
+    return df, rule_hits, timings, nik_provider_counts, provider_default
+
+
+# ==========================================================
+#                HARD TUNING FRAUD SCORING
+# ==========================================================
+# Rule CRITICAL / MAJOR / MINOR ada di fraud_rules.json (kondisi, bobot, tier).
 
+def label_full(df, rules, scale_mode, state, workers=1):
+    if workers > 1:
+        df, rule_hits, timings, nik_provider_counts, provider_default = (
+            evaluate_claims_parallel(df, rules, workers)
+        )
+    else:
+        df, rule_hits, timings, nik_provider_counts, provider_default = evaluate_claims(df, rules)
+    raw = rules.score(rule_hits)
+
+    # ======================================================
+    #               HARD TUNING NORMALIZATION
+    # ======================================================
+    # Step 1: clip max to avoid outlier explosion
+    # Step 2: scaling → normalizing to 0–100
+    #   batch : dibagi skor max batch ini (hasil lama), konstanta disimpan ulang
+    #   fixed : dibagi konstanta kalibrasi tersimpan → skor per klaim tidak
+    #           bergantung klaim lain di batch (cocok untuk upload kecil / streaming)
+    if scale_mode == "fixed" and state.get('score_scale'):
+        score_scale = state['score_scale']
+    else:
+        if scale_mode == "fixed":
+            print("Kalibrasi skor belum ada → dihitung dari batch ini.")
+        score_scale = rules.calibrate(raw)
+    df['fraud_score'] = rules.normalize(raw, score_scale)
+
+    # ======================================================
+    #                   FINAL LABELING
+    # ======================================================
+    # threshold HIGH / MEDIUM dari file rule
+    df['fraud_label'] = rules.label(df['fraud_score'])
+    write_rule_report(rules, rule_hits, df, timings, "full")
+
+    # SPLIT DATA
+    # Pastikan total row cukup
+    if len(df) <= NEW_CLAIMS_COUNT:
+        raise ValueError("Data kurang untuk split klaim baru")
+
+    training_df = df.iloc[:-NEW_CLAIMS_COUNT].copy()
+    new_claims_df = df.iloc[-NEW_CLAIMS_COUNT:].copy()
+
+    print(f"Total data: {len(df)}")
+    print(f"Training: {len(training_df)}")
+    print(f"New claims: {len(new_claims_df)}")
+
+    training_df.to_csv(TRAINING_FILE, index=False)
+    new_claims_df.to_csv(HOLDOUT_FILE, index=False)
+    if os.path.exists(label_state.LABEL_PATCH_FILE):
+        os.remove(label_state.LABEL_PATCH_FILE)
+
+    # matriks hit (bitset, urutan baris = training lalu new claims) untuk what-if bobot
+    RuleHits.from_hits(rule_hits, rules, df['provider_id'], score_scale).save()
+
+    # tabel NIK × provider disimpan untuk update provider_balance_score inkremental
+    # + konstanta kalibrasi untuk mode --scale fixed
+    label_state.save_state({
+        'nik_provider_counts': nik_provider_counts,
+        'provider_default': provider_default,
+        'score_scale': score_scale,
+        'row_keys': label_state.row_keys(df),
+        'n_training': len(training_df),
+        'n_holdout': len(new_claims_df),
+    })
+
+    print("✔ Hard tuning completed.")
+    print(f"✔ {len(training_df)} labeled claims saved.")
+    print(f"✔ {len(new_claims_df)} evaluation claims saved.")
+    return df
 
-training_df.to_csv("dummy_claims_with_fraud_label.csv", index=False)
-new_claims_df.to_csv("new_claims_30.csv", index=False)
 
-print("✔ Hard tuning completed.")
-print("✔ 5000 labeled claims saved.")
-print("✔ 30 evaluation claims saved.")
+# ==========================================================
+#        LABELING INKREMENTAL (hanya klaim baru + yang berubah)
+# ==========================================================
+# Syarat: FEATURE_FILE = baris lama (urutan sama dengan matriks hit) + klaim
+# baru di belakang, seperti hasil `feature_engineering.py --incremental`.
+# Kandidat dihitung ulang: klaim baru, klaim lama dari NIK yang tersentuh
+# (provider_balance_score, duplicate_ID_count berubah) dan dari provider yang
+# tersentuh (service_mix_index, month_over_month_claim_growth berubah). Rule yang
+# memakai fitur GLOBAL_FEATURES (berubah untuk semua klaim) → semua klaim lama kandidat.
+# Skor memakai kalibrasi tetap (--scale fixed) supaya klaim lain tidak berubah.
+#   klaim baru         → di-append ke TRAINING_FILE
+#   klaim lama berubah → kolom label (label_state.PATCH_COLS) ke LABEL_PATCH_FILE,
+#                        hanya jika pola hit atau provider_balance_score berubah
+#                        (skor & label hanya bergantung pada pola hit); kolom fitur
+#                        dibaca ulang dari store fitur oleh label_state.read_labeled
+
+GLOBAL_FEATURES = ['provider_claim_rate_vs_peer']
+
+
+def label_incremental(df, rules, state, hits):
+    n_old = len(hits)
+    new = df.iloc[n_old:].copy()
+    touched_nik = new['NIK'].unique()
+    touched_provider = new['provider_id'].unique()
+
+    nik_provider_counts = label_state.updated_nik_provider_counts(state['nik_provider_counts'], new)
+    provider_default = label_state.updated_provider_default(state['provider_default'], new)
+
+    old = df.iloc[:n_old]
+    if any(c in GLOBAL_FEATURES for c in rules.columns):
+        candidate = np.arange(n_old)
+    else:
+        candidate = np.flatnonzero(
+            old['NIK'].isin(touched_nik).to_numpy()
+            | old['provider_id'].isin(touched_provider).to_numpy()
+        )
+    rows = pd.concat([old.iloc[candidate], new])
+
+    # provider_balance_score hanya untuk NIK yang ada di kandidat (lama vs baru)
+    row_niks = rows['NIK'].unique()
+    old_counts = state['nik_provider_counts']
+    old_scores = label_state.provider_balance_scores(
+        old_counts[old_counts.index.get_level_values('NIK').isin(row_niks)]
+    )
+    row_counts = nik_provider_counts[
+        nik_provider_counts.index.get_level_values('NIK').isin(row_niks)
+    ]
+    rows = add_derived_columns(
+        rows, provider_default, label_state.provider_balance_scores(row_counts)
+    )
+    timings = np.zeros(len(rules.ids))
+    rule_hits = rules.evaluate(rows, extra=rule_extra_columns(rows), timings=timings)
+    rows['fraud_score'] = rules.normalize(rules.score(rule_hits), state['score_scale'])
+    rows['fraud_label'] = rules.label(rows['fraud_score'])
+    write_rule_report(rules, rule_hits, rows, timings, "incremental")
+
+    # klaim lama: matriks hit di-update jika pola hit berubah, store label di-patch
+    # jika pola hit atau provider_balance_score berubah (dibandingkan di memori)
+    k = len(candidate)
+    hit_changed = (hits.hits()[candidate] != rule_hits[:k]).any(axis=1)
+    old_balance = old['NIK'].iloc[candidate].map(old_scores).to_numpy()
+    balance_changed = rows['provider_balance_score'].iloc[:k].to_numpy() != old_balance
+    changed = hit_changed | balance_changed
+
+    patches = rows.iloc[:k][changed][label_state.PATCH_COLS]
+    patches.insert(0, 'row_id', candidate[changed])
+    appended = rows.iloc[k:][label_state.labeled_columns()]
+
+    label_state.append_labeled(appended, patches)
+    hits.update(candidate[hit_changed], rule_hits[:k][hit_changed])
+    hits.append(rule_hits[k:], new['provider_id'])
+    hits.score_scale = state['score_scale']
+    hits.save()
+
+    state.update({
+        'nik_provider_counts': nik_provider_counts,
+        'provider_default': provider_default,
+        'row_keys': np.concatenate([state['row_keys'], label_state.row_keys(new)]),
+    })
+    label_state.save_state(state)
+
+    print(f"Incremental: {len(appended)} klaim baru dilabel, "
+          f"{k} klaim lama dicek, {len(patches)} di-patch "
+          f"({hit_changed.sum()} pola hit berubah).")
+    print(appended['fraud_label'].value_counts())
+    return appended, patches
+
+
+def can_label_incremental(df, rules, state, hits):
+    if state is None or hits is None or not state.get('score_scale'):
+        return False, "state / matriks hit / kalibrasi belum ada"
+    if 'provider_default' not in state or 'row_keys' not in state:
+        return False, "state labeling versi lama"
+    if hits.rule_ids != rules.ids or not np.array_equal(hits.weights, rules.weights):
+        return False, "file rule berubah sejak labeling terakhir"
+    if len(df) <= len(hits):
+        return False, "tidak ada klaim baru di file fitur"
+    if len(state['row_keys']) != len(hits) or not np.array_equal(
+        label_state.row_keys(df.iloc[:len(hits)]), state['row_keys']
+    ):
+        return False, "urutan baris lama di file fitur berbeda dengan matriks hit"
+    return True, ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Labeling fraud berbasis rule")
+    parser.add_argument("--rules", default=RULE_FILE, help="file rule JSON (default: fraud_rules.json)")
+    parser.add_argument(
+        "--scale", choices=["batch", "fixed"], default="batch",
+        help="batch: normalisasi dengan skor max batch ini (dan simpan sebagai kalibrasi); "
+             "fixed: pakai konstanta kalibrasi tersimpan di label_state.pkl"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="hanya label klaim baru di akhir file fitur + patch klaim lama yang berubah "
+             "(skala fixed); jatuh ke labeling penuh jika state tidak cocok"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="labeling penuh: jumlah proses, data dipartisi per hash NIK"
+    )
+    args = parser.parse_args()
+
+    # Rule diparse & dikompilasi sekali
+    RULES = RuleSet.load(args.rules)
+    df = load_features(FEATURE_FILE, RULES)
+    state = label_state.load_state()
+
+    if args.incremental:
+        hits = RuleHits.load() if os.path.exists(RULE_HITS_FILE) else None
+        ok, reason = can_label_incremental(df, RULES, state, hits)
+        if ok:
+            label_incremental(df, RULES, state, hits)
+        else:
+            print(f"Labeling inkremental tidak bisa ({reason}) → labeling penuh.")
+            label_full(df, RULES, "fixed", state or {}, args.workers)
+    else:
+        label_full(df, RULES, args.scale, state or {}, args.workers)
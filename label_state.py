@@ -0,0 +1,141 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_engineering import FEATURE_FILE, REFRESHED_COLS, load_feature_store
+from feature_state import CARRY_COLS
+
+# ==========================================================
+#           STATE LABELING (fraud_label.py)
+# ==========================================================
+# Disimpan setiap kali fraud_label.py jalan:
+#   nik_provider_counts : jumlah klaim per (NIK, provider_id)   (provider_balance_score)
+#   score_scale         : konstanta kalibrasi skor (max skor mentah ter-clip) untuk --scale fixed
+#   provider_default    : provider pertama per NIK (provider_id_default)
+#   row_keys            : hash (NIK, provider_id, claim_date) per baris matriks hit → cek urutan
+#   n_training, n_holdout : ukuran split labeling penuh terakhir
+#
+# Store label = TRAINING_FILE + HOLDOUT_FILE dari labeling penuh; mode --incremental
+# meng-append klaim baru ke TRAINING_FILE dan menulis kolom label (PATCH_COLS) klaim
+# lama yang berubah ke LABEL_PATCH_FILE (row_id = baris matriks hit, satu baris per
+# row_id). Kolom fitur baris lama yang bisa berubah (REFRESHED_COLS) tidak di-patch:
+# read_labeled mengambil nilai terkininya dari store fitur selama urutan barisnya
+# sama dengan row_keys. Baca lewat read_labeled / read_training.
+
+LABEL_STATE_FILE = "label_state.pkl"
+TRAINING_FILE = "dummy_claims_with_fraud_label.csv"
+HOLDOUT_FILE = "new_claims_30.csv"
+LABEL_PATCH_FILE = "fraud_label_patches.csv"
+ROW_KEY_COLS = ['NIK', 'provider_id', 'claim_date']
+PATCH_COLS = [
+    'provider_id_default', 'los_anomaly_flag', 'provider_balance_score',
+    'fraud_score', 'fraud_label',
+]
+
+
+# ============ PROVIDER BALANCE ============
+def nik_provider_counts(df):
+    # tabel NIK × provider dalam bentuk long (Series ber-MultiIndex)
+    return df.groupby(['NIK', 'provider_id']).size()
+
+
+def provider_balance_scores(counts):
+    # skor per NIK dari satu agregasi: jumlah provider, max & total klaim
+    by_nik = counts.groupby(level='NIK')
+    n_providers = by_nik.size()
+    top_ratio = by_nik.max() / by_nik.sum()
+
+    score = np.select(
+        [n_providers == 1, top_ratio <= 0.55, top_ratio <= 0.75],
+        [0, 12, 6],
+        default=2,
+    )
+    return pd.Series(score, index=n_providers.index)
+
+
+def updated_nik_provider_counts(counts, new):
+    new_counts = nik_provider_counts(new)
+    return counts.add(new_counts, fill_value=0).astype(int)
+
+
+def updated_provider_default(provider_default, new):
+    # NIK lama tetap memakai provider pertamanya, NIK baru ambil dari klaim barunya
+    new_default = new.groupby('NIK')['provider_id'].first()
+    return pd.concat([provider_default, new_default[~new_default.index.isin(provider_default.index)]])
+
+
+def row_keys(df):
+    return pd.util.hash_pandas_object(df[ROW_KEY_COLS], index=False).to_numpy()
+
+
+# ============ STORE LABEL ============
+def labeled_columns(path=TRAINING_FILE):
+    return pd.read_csv(path, nrows=0).columns.tolist()
+
+
+def append_labeled(new_rows, patches):
+    # patch lama + baru, satu baris per row_id (yang terbaru) → ukuran ≤ klaim yang pernah berubah
+    new_rows.to_csv(TRAINING_FILE, mode='a', header=False, index=False)
+    if not len(patches):
+        return
+    patches = patches[['row_id'] + PATCH_COLS]
+    if os.path.exists(LABEL_PATCH_FILE):
+        old = pd.read_csv(LABEL_PATCH_FILE).reindex(columns=patches.columns)
+        patches = pd.concat([old, patches], ignore_index=True)
+    patches.drop_duplicates('row_id', keep='last').sort_values('row_id').to_csv(
+        LABEL_PATCH_FILE, index=False
+    )
+
+
+def overlay_features(df, state, path=FEATURE_FILE):
+    # kolom fitur yang berubah untuk klaim lama diambil dari store fitur terkini
+    if not os.path.exists(path) or 'row_keys' not in state or len(state['row_keys']) != len(df):
+        return df
+    features = load_feature_store(path, CARRY_COLS + REFRESHED_COLS)
+    features = features.iloc[:len(df)]
+    if len(features) != len(df) or not np.array_equal(row_keys(features), state['row_keys']):
+        return df
+    for col in REFRESHED_COLS:
+        if col in df.columns and col in features.columns:
+            df[col] = features[col].to_numpy()
+    return df
+
+
+def read_labeled(state=None):
+    # semua klaim berlabel dalam urutan matriks hit: training awal, holdout, lalu append
+    state = state or load_state()
+    training = pd.read_csv(TRAINING_FILE, dtype={"NIK": str})
+    holdout = pd.read_csv(HOLDOUT_FILE, dtype={"NIK": str})
+    n_training = state['n_training'] if state and 'n_training' in state else len(training)
+    df = pd.concat(
+        [training.iloc[:n_training], holdout, training.iloc[n_training:]], ignore_index=True
+    )
+
+    if os.path.exists(LABEL_PATCH_FILE):
+        patches = pd.read_csv(LABEL_PATCH_FILE, dtype={"NIK": str})
+        patches = patches.drop_duplicates('row_id', keep='last').set_index('row_id')
+        df.loc[patches.index, patches.columns] = patches
+    return overlay_features(df, state) if state else df
+
+
+def read_training(state=None):
+    # TRAINING_FILE + patch (tanpa klaim holdout)
+    state = state or load_state()
+    if not state or 'n_training' not in state:
+        return pd.read_csv(TRAINING_FILE, dtype={"NIK": str})
+    df = read_labeled(state)
+    holdout = np.arange(state['n_training'], state['n_training'] + state['n_holdout'])
+    return df.drop(index=holdout).reset_index(drop=True)
+
+
+# ============ PERSIST ============
+def save_state(state, path=LABEL_STATE_FILE):
+    joblib.dump(state, path)
+
+
+def load_state(path=LABEL_STATE_FILE):
+    if not os.path.exists(path):
+        return None
+    return joblib.load(path)
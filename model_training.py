@@ -0,0 +1,217 @@
+import os
+import shutil
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.utils.class_weight import compute_sample_weight
+from threadpoolctl import threadpool_limits
+
+from feature_engineering import FEATURES, parse_dates
+from label_state import read_training
+
+# ==========================================================
+#     TRAINING MODEL FRAUD (dipakai classification_RF.py & benchmark)
+# ==========================================================
+
+MODEL_FILE = "fraud_model.pkl"           # versi terbaru (dipakai new_claims.py / dashboard)
+MODEL_DIR = "models"                     # semua versi: fraud_model_v001.pkl, ...
+MODEL_MANIFEST = os.path.join(MODEL_DIR, "model_versions.csv")
+
+MODEL_FEATURES = [
+    'age','NIK_valid','biometric_flag','num_diagnoses','num_procedures',
+    'length_of_stay','total_claim_amount','diagnosis_cost_ratio',
+    'avg_cost_per_procedure','verification_delay_days',
+    'duplicate_ID_count','duplicate_ID_count_month','time_between_admissions',
+    'num_claims_last_30d_by_provider','num_unique_patients_last_30d',
+    'provider_claim_rate_vs_peer','claim_rejection_rate_provider',
+    'month_over_month_claim_growth','sudden_spike_flag',
+    'avg_claim_per_patient','claim_fragmentation_score','service_mix_index'
+]
+
+CLASS_WEIGHT = {'HIGH': 4, 'MEDIUM': 1.5, 'NORMAL': 1}
+
+RF_PARAMS = dict(
+    n_estimators=300,
+    max_depth=12,
+    class_weight=CLASS_WEIGHT,
+    random_state=42,
+)
+
+# HistGradientBoosting: fitur di-bin (≤ 255 bin) → split dicari di histogram,
+# bukan di nilai terurut; bobot kelas (CLASS_WEIGHT) lewat sample_weight
+# sehingga tidak perlu SMOTE. (class_weight={label string: bobot} di HGB
+# dicocokkan setelah y di-encode → gagal untuk label string.)
+# Paralel lewat thread OpenMP (dibatasi threadpoolctl), bukan joblib.
+HGB_PARAMS = dict(
+    max_iter=300,
+    learning_rate=0.1,
+    max_leaf_nodes=31,
+    max_bins=255,
+    early_stopping=True,
+    random_state=42,
+)
+
+# rf  : RandomForest (exact split) + SMOTE
+# hgb : HistGradientBoosting + class weight
+# (strategi rebalancing lain: lihat rebalancing.py)
+ENGINES = ["rf", "hgb"]
+DEFAULT_REBALANCE = {"rf": "smote", "hgb": "none"}
+
+# threads  : satu proses, X dipakai bersama (splitter sklearn melepas GIL)
+# processes: worker loky, X besar di-memmap joblib; tiap worker punya salinan
+#            array kerja sendiri + tree dikirim balik via pickle
+BACKENDS = {"threads": "threading", "processes": "loky"}
+MEMORY_FRACTION = 0.7   # porsi memori tersedia yang boleh dipakai worker training
+
+
+# ============ DATA ============
+def load_training_data(features=None):
+    # dummy_claims_with_fraud_label.csv + patch dari fraud_label.py --incremental
+    features = list(features or MODEL_FEATURES)
+    df = read_training()
+
+    # kolom fitur yang belum ada di file dihitung lewat registry
+    df = FEATURES.ensure(parse_dates(df), features)
+    return df[features], df['fraud_label']
+
+
+# ============ WORKER (memory-aware) ============
+def available_memory():
+    # MemAvailable (Linux) → fallback halaman fisik bebas
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def worker_memory(n_rows, n_features, backend="threads", max_depth=12, n_classes=3):
+    # estimasi memori satu worker yang sedang membangun satu tree:
+    #   sample_weight bootstrap (float64) + indeks sampel & nilai fitur splitter
+    #   (~ intp + float32 + float64 per baris) + node tree (≤ 2^(depth+1) node)
+    per_tree = n_rows * (8 + 8 + 4 + 8)
+    per_tree += 2 ** (max_depth + 1) * (64 + 8 * n_classes)
+    if backend == "processes":
+        per_tree += n_rows * n_features * 4   # X float32 yang diproses ulang per worker
+    return per_tree
+
+
+def training_workers(n_jobs, n_rows, n_features, backend="threads", max_depth=12):
+    # n_jobs None / -1 → semua core, lalu dibatasi memori yang tersedia
+    cores = os.cpu_count() or 1
+    wanted = cores if n_jobs in (None, -1) else max(int(n_jobs), 1)
+    available = available_memory()
+    if available is None:
+        return wanted
+    per_worker = worker_memory(n_rows, n_features, backend, max_depth)
+    return max(1, min(wanted, int(available * MEMORY_FRACTION // per_worker)))
+
+
+# ============ FIT ============
+def build_forest(n_jobs=1, **params):
+    return RandomForestClassifier(**{**RF_PARAMS, **params, 'n_jobs': n_jobs})
+
+
+def fit_forest(model, X, y, backend="threads"):
+    with joblib.parallel_config(backend=BACKENDS[backend]):
+        model.fit(X, y)
+    return model
+
+
+def build_model(engine="rf", n_jobs=1, **params):
+    if engine == "rf":
+        return build_forest(n_jobs, **params)
+    if engine == "hgb":
+        return HistGradientBoostingClassifier(**{**HGB_PARAMS, **params})
+    raise ValueError(f"Engine tidak dikenal: {engine} (pilihan: {ENGINES})")
+
+
+def fit_model(model, X, y, n_jobs=1, backend="threads", class_weight=None):
+    # kontrak sama untuk semua engine: fit → predict / predict_proba atas classes_
+    # class_weight: bobot dari strategi rebalancing (None = CLASS_WEIGHT)
+    if isinstance(model, RandomForestClassifier):
+        if class_weight is not None:
+            model.set_params(class_weight=class_weight)
+        return fit_forest(model, X, y, backend)
+    with threadpool_limits(limits=n_jobs, user_api="openmp"):
+        model.fit(X, y, sample_weight=compute_sample_weight(class_weight or CLASS_WEIGHT, y))
+    return model
+
+
+# ============ WARM START (tambah tree dari batch baru) ============
+def grow_forest(model, X, y, n_new, retire=0, backend="threads", seed=None):
+    # tree lama dipertahankan, n_new tree baru di-fit hanya pada (X, y) batch baru;
+    # retire: buang tree tertua lebih dulu → ukuran forest tetap terkendali
+    # seed: random_state langkah ini (unik per versi). sklearn menurunkan seed tree
+    # baru dari posisinya di forest; tanpa seed baru, posisi yang bergeser karena
+    # retire / langkah sebelumnya memberi seed yang sama dengan tree yang masih ada
+    missing = set(model.classes_) - set(pd.unique(np.asarray(y)))
+    if missing:
+        raise ValueError(f"Batch baru tidak punya kelas {sorted(missing)} → tambahkan data replay")
+    if seed is not None:
+        model.set_params(random_state=seed)
+    if retire:
+        model.estimators_ = model.estimators_[min(retire, len(model.estimators_)):]
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_new)
+    fit_forest(model, X, y, backend)
+    model.set_params(warm_start=False)
+    return model
+
+
+# ============ VERSI MODEL ============
+MANIFEST_COLS = [
+    'version', 'file', 'created', 'mode', 'engine', 'parent', 'n_trees',
+    'n_rows_fit', 'n_training_rows', 'train_seconds',
+]
+
+
+def load_manifest():
+    if not os.path.exists(MODEL_MANIFEST):
+        return pd.DataFrame(columns=MANIFEST_COLS)
+    return pd.read_csv(MODEL_MANIFEST).reindex(columns=MANIFEST_COLS)
+
+
+def save_model_version(model, mode, n_rows_fit, n_training_rows, train_seconds, parent=None):
+    # simpan sebagai versi baru + salin ke MODEL_FILE
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    manifest = load_manifest()
+    version = int(manifest['version'].max()) + 1 if len(manifest) else 1
+    path = os.path.join(MODEL_DIR, f"fraud_model_v{version:03d}.pkl")
+    joblib.dump(model, path)
+    shutil.copyfile(path, MODEL_FILE)
+
+    manifest.loc[len(manifest)] = {
+        'version': version, 'file': path,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'mode': mode, 'engine': model_engine(model), 'parent': parent,
+        'n_trees': model_size(model),
+        'n_rows_fit': n_rows_fit, 'n_training_rows': n_training_rows,
+        'train_seconds': round(train_seconds, 3),
+    }
+    manifest.astype({'parent': 'Int64'}).to_csv(MODEL_MANIFEST, index=False)
+    return version, path
+
+
+def model_engine(model):
+    return "rf" if isinstance(model, RandomForestClassifier) else "hgb"
+
+
+def model_size(model):
+    # jumlah tree: RF = estimators_, HGB = iterasi boosting × kelas
+    if isinstance(model, RandomForestClassifier):
+        return len(model.estimators_)
+    return model.n_iter_ * len(model.classes_)
+
+
+def latest_version():
+    manifest = load_manifest()
+    return manifest.iloc[-1] if len(manifest) else None
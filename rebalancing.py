@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import SMOTE
+
+from model_training import CLASS_WEIGHT
+
+# ==========================================================
+#   REBALANCING KELAS SEBELUM TRAINING
+# ==========================================================
+# smote        : SMOTE imblearn (k-NN exact atas semua baris minoritas)
+# smote_approx : SMOTE dengan tetangga aproksimasi — baris diurutkan menurut
+#                beberapa proyeksi acak, kandidat tetangga = WINDOW baris di
+#                kiri/kanan tiap urutan, k terdekat dipilih dari kandidat saja.
+#                Biaya O(n · kandidat · fitur) per kelas, memori per blok baris.
+# undersample  : NORMAL dikurangi sampai RATIO × kelas minoritas terbesar,
+#                sampling proporsional per kuantil STRATIFY_COL (distribusi
+#                nominal klaim NORMAL tetap)
+# class_weight : tanpa resampling, CLASS_WEIGHT × frekuensi invers kelas
+# none         : tanpa resampling, CLASS_WEIGHT apa adanya (default engine hgb)
+# Semua strategi → (X, y, class_weight); class_weight None = CLASS_WEIGHT.
+
+STRATEGIES = ["smote", "smote_approx", "undersample", "class_weight", "none"]
+MAJORITY = "NORMAL"
+K_NEIGHBORS = 5
+WINDOW = 16
+N_PROJECTIONS = 3
+BLOCK_ROWS = 1024
+RATIO = 1.0
+STRATIFY_COL = "total_claim_amount"
+STRATIFY_BINS = 10
+
+
+# ============ SMOTE EXACT ============
+def smote(X, y, seed=42):
+    # k tetangga dikecilkan jika kelas terkecil sedikit (batch kecil mode incremental)
+    smallest = y.value_counts().min()
+    if smallest < 2:
+        return X, y
+    sm = SMOTE(random_state=seed, k_neighbors=min(K_NEIGHBORS, smallest - 1))
+    return sm.fit_resample(X, y)
+
+
+# ============ SMOTE APROKSIMASI ============
+def approx_neighbors(X, k=K_NEIGHBORS, window=WINDOW, n_projections=N_PROJECTIONS, seed=42):
+    # → indeks k tetangga (aproksimasi) per baris, tidak termasuk baris itu sendiri
+    n = len(X)
+    k = min(k, n - 1)
+    rng = np.random.default_rng(seed)
+    directions = rng.normal(size=(X.shape[1], n_projections))
+    orders = np.argsort(X @ directions, axis=0, kind="stable")      # n × P
+    ranks = np.empty_like(orders)
+    for p in range(n_projections):
+        ranks[orders[:, p], p] = np.arange(n)
+
+    offsets = np.concatenate([np.arange(-window, 0), np.arange(1, window + 1)])
+    neighbors = np.empty((n, k), dtype=np.int64)
+    for start in range(0, n, BLOCK_ROWS):
+        rows = np.arange(start, min(start + BLOCK_ROWS, n))
+        # kandidat: tetangga di setiap urutan proyeksi (posisi di-clip ke tepi)
+        pos = np.clip(ranks[rows][:, :, None] + offsets, 0, n - 1)            # B × P × 2W
+        cand = orders[pos, np.arange(n_projections)[None, :, None]].reshape(len(rows), -1)
+        diff = X[cand] - X[rows][:, None, :]
+        dist = np.einsum("bcf,bcf->bc", diff, diff)
+        dist[cand == rows[:, None]] = np.inf
+        best = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        neighbors[rows] = np.take_along_axis(cand, best, axis=1)
+    return neighbors
+
+
+def smote_approx(X, y, seed=42):
+    # interpolasi SMOTE biasa: x + u · (tetangga − x), u ~ U(0, 1);
+    # tiap kelas ditambah sampai sama dengan kelas terbesar
+    columns = X.columns
+    X_arr = X.to_numpy(dtype=np.float64)
+    y_arr = np.asarray(y)
+    counts = pd.Series(y_arr).value_counts()
+    rng = np.random.default_rng(seed)
+
+    parts_X, parts_y = [X_arr], [y_arr]
+    for label, count in counts.items():
+        n_new = counts.max() - count
+        if n_new == 0 or count < 2:
+            continue
+        X_c = X_arr[y_arr == label]
+        neighbors = approx_neighbors(X_c, seed=seed)
+        base = rng.integers(0, count, size=n_new)
+        pick = neighbors[base, rng.integers(0, neighbors.shape[1], size=n_new)]
+        gap = rng.random((n_new, 1))
+        parts_X.append(X_c[base] + gap * (X_c[pick] - X_c[base]))
+        parts_y.append(np.full(n_new, label, dtype=object))
+
+    X_res = pd.DataFrame(np.concatenate(parts_X), columns=columns).astype(X.dtypes.to_dict())
+    return X_res, pd.Series(np.concatenate(parts_y), name=y.name)
+
+
+# ============ UNDERSAMPLING ============
+def undersample(X, y, ratio=RATIO, seed=42):
+    y_arr = np.asarray(y)
+    counts = pd.Series(y_arr).value_counts()
+    target = int(counts.drop(MAJORITY, errors="ignore").max() * ratio)
+    majority = np.flatnonzero(y_arr == MAJORITY)
+    if target >= len(majority):
+        return X, y
+
+    # jatah per strata kuantil sebanding ukuran strata
+    strata = pd.qcut(
+        X[STRATIFY_COL].to_numpy()[majority], STRATIFY_BINS, labels=False, duplicates="drop"
+    )
+    rng = np.random.default_rng(seed)
+    keep = []
+    sizes = np.bincount(strata)
+    quota = np.floor(sizes / sizes.sum() * target).astype(int)
+    for s, q in enumerate(quota):
+        members = majority[strata == s]
+        keep.append(rng.choice(members, size=min(q, len(members)), replace=False))
+    rows = np.sort(np.concatenate([np.flatnonzero(y_arr != MAJORITY)] + keep))
+    return X.iloc[rows], y.iloc[rows]
+
+
+# ============ CLASS WEIGHT ============
+def balanced_class_weight(y):
+    counts = pd.Series(np.asarray(y)).value_counts()
+    n, k = counts.sum(), len(counts)
+    return {c: CLASS_WEIGHT.get(c, 1) * n / (k * counts[c]) for c in counts.index}
+
+
+def rebalance(X, y, strategy="smote", seed=42):
+    if strategy == "smote":
+        return (*smote(X, y, seed), None)
+    if strategy == "smote_approx":
+        return (*smote_approx(X, y, seed), None)
+    if strategy == "undersample":
+        return (*undersample(X, y, seed=seed), None)
+    if strategy == "class_weight":
+        return X, y, balanced_class_weight(y)
+    if strategy == "none":
+        return X, y, None
+    raise ValueError(f"Strategi rebalancing tidak dikenal: {strategy} (pilihan: {STRATEGIES})")
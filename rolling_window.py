@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+#        ROLLING WINDOW ENGINE (sliding window per key)
+# ==========================================================
+# Semua window memakai definisi yang sama dengan feature_engineering.py:
+#   klaim j masuk window klaim i jika  date_i - days < date_j <= date_i
+# (klaim di tanggal yang sama ikut terhitung, termasuk klaim itu sendiri)
+
+
+def rolling_nunique_multi(keys, values, dates, horizons, order=None) -> dict:
+    # Jumlah value unik (mis. NIK) per key (mis. provider) di window (date - days, date],
+    # {days: array} untuk semua horizon sekaligus.
+    # Sliding window: multiset value → count per horizon, bertambah saat window
+    # maju dan berkurang saat klaim lama keluar window. Satu sweep terurut per
+    # key untuk semua horizon, O(n × jumlah horizon).
+    # order: permutasi yang sudah mengurutkan baris per (key, date) → tidak di-sort lagi
+    horizons = list(horizons)
+    codes, _ = pd.factorize(pd.Series(keys).to_numpy(), sort=False)
+    vcodes, vuniq = pd.factorize(pd.Series(values).to_numpy(), sort=False)
+    t = pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[ns]").astype(np.int64)
+    n = len(t)
+    if n == 0:
+        return {h: np.zeros(0, dtype=np.int64) for h in horizons}
+
+    if order is None:
+        order = np.lexsort((t, codes))
+    k_sorted = codes[order]
+    v_sorted = vcodes[order].tolist()
+    t_sorted = t[order].tolist()
+    spans = [pd.Timedelta(days=h).value for h in horizons]
+    H = range(len(horizons))
+
+    bounds = np.flatnonzero(np.diff(k_sorted)) + 1
+    starts = np.r_[0, bounds].tolist()
+    ends = np.r_[bounds, n].tolist()
+
+    multisets = [[0] * len(vuniq) for _ in H]
+    out = [[] for _ in H]
+
+    for start, end in zip(starts, ends):
+        distinct = [0] * len(horizons)
+        left = [start] * len(horizons)
+        i = start
+
+        while i < end:
+            d = t_sorted[i]
+
+            # masukkan semua klaim di tanggal d
+            j = i
+            while j < end and t_sorted[j] == d:
+                c = v_sorted[j]
+                for h in H:
+                    ms = multisets[h]
+                    if ms[c] == 0:
+                        distinct[h] += 1
+                    ms[c] += 1
+                j += 1
+
+            for h in H:
+                # keluarkan klaim yang sudah lewat window horizon h
+                ms = multisets[h]
+                lo = d - spans[h]
+                p = left[h]
+                while t_sorted[p] <= lo:
+                    c = v_sorted[p]
+                    ms[c] -= 1
+                    if ms[c] == 0:
+                        distinct[h] -= 1
+                    p += 1
+                left[h] = p
+                out[h].extend([distinct[h]] * (j - i))
+
+            i = j
+
+        # reset multiset sebelum key berikutnya
+        for h in H:
+            ms = multisets[h]
+            for p in range(left[h], end):
+                ms[v_sorted[p]] -= 1
+
+    result = {}
+    for h in H:
+        arr = np.empty(n, dtype=np.int64)
+        arr[order] = out[h]
+        result[horizons[h]] = arr
+    return result
@@ -0,0 +1,225 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rule_hits import RuleHits, RULE_HITS_FILE
+from rule_whatif import parse_pairs
+import label_state
+
+# ==========================================================
+#   BACKTEST GRID BOBOT / THRESHOLD RULE (process pool)
+# ==========================================================
+# Memakai matriks hit dari fraud_label.py (rule_hits.npz). Semua konfigurasi
+# dihitung di level pola hit unik: skor untuk satu blok konfigurasi adalah
+# satu perkalian (pola × rule) @ (rule × konfigurasi).
+#
+# Contoh:
+#   python rule_backtest.py --weight-grid biometric_missing=12,16,20 \
+#       --weight-grid nik_invalid=10,15 --threshold-grid HIGH=60,66,70 \
+#       --threshold-grid MEDIUM=35,40,45 --workers 4
+#   python rule_backtest.py ... --reference reviewed_claims.csv --label-col label_final
+
+SUMMARY_FILE = "backtest_summary.csv"
+PROVIDER_FILE = "backtest_providers.csv"
+BLOCK_CONFIGS = 256
+
+_CTX = {}
+
+
+# ============ GRID ============
+def build_grid(hits, weight_grid, threshold_grid):
+    # product dari semua nilai → matriks bobot (C × R) dan threshold (C × T)
+    labels = [name for name, _ in sorted(hits.thresholds.items(), key=lambda x: -x[1])]
+    w_keys, t_keys = list(weight_grid), list(threshold_grid)
+    combos = list(itertools.product(
+        *[weight_grid[k] for k in w_keys], *[threshold_grid[k] for k in t_keys]
+    ))
+
+    weights = np.tile(hits.weights.astype(float), (len(combos), 1))
+    thresholds = np.tile([float(hits.thresholds[l]) for l in labels], (len(combos), 1))
+    for c, combo in enumerate(combos):
+        for k, v in zip(w_keys, combo[:len(w_keys)]):
+            weights[c, hits.rule_ids.index(k)] = v
+        for k, v in zip(t_keys, combo[len(w_keys):]):
+            thresholds[c, labels.index(k)] = v
+
+    configs = pd.DataFrame(combos, columns=w_keys + [f"threshold_{k}" for k in t_keys])
+    configs.index.name = 'config_id'
+    return configs, weights, thresholds, labels
+
+
+def reference_table(hits, reference, labels):
+    # jumlah klaim per (pola hit, label referensi) → agreement tanpa loop per klaim
+    inverse = hits.patterns()[1]
+    ref_idx = pd.Index(labels).get_indexer(np.asarray(reference)).astype(np.int64)
+    ref_idx[ref_idx < 0] = len(labels)   # label referensi lain → tidak pernah cocok
+    n_patterns = len(hits.patterns()[0])
+    table = np.bincount(inverse * (len(labels) + 1) + ref_idx,
+                        minlength=n_patterns * (len(labels) + 1))
+    return table.reshape(n_patterns, len(labels) + 1)
+
+
+# ============ WORKER ============
+def _init_worker(ctx):
+    _CTX.update(ctx)
+
+
+def evaluate_block(weights, thresholds):
+    # weights: (C × R), thresholds: (C × T) → statistik per konfigurasi
+    ctx = _CTX
+    raw = ctx['pattern_hits'] @ weights.T                      # U × C
+    raw = np.minimum(raw, ctx['clip'])
+    scale = ctx['score_scale'] or raw.max(axis=0)              # sama dengan RuleHits.pattern_scores
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.minimum(np.round(raw / scale * 100, 2), 100.0)
+
+    n_labels = thresholds.shape[1]
+    label_idx = np.full(scores.shape, n_labels, dtype=np.int64)   # default label
+    for t in reversed(range(n_labels)):                            # sama dengan np.select
+        label_idx[scores >= thresholds[:, t]] = t
+
+    counts = ctx['pattern_counts'][:, None]
+    label_counts = np.stack(
+        [((label_idx == t) * counts).sum(axis=0) for t in range(n_labels + 1)], axis=1
+    )
+    agreement = np.take_along_axis(ctx['ref_table'], label_idx, axis=1).sum(axis=0)
+
+    # HIGH (label pertama) vs referensi HIGH
+    high = label_idx == 0
+    high_hit = (high * ctx['ref_table'][:, [0]]).sum(axis=0)
+    ref_high = ctx['ref_table'][:, 0].sum()
+
+    # flag rate per provider dari pasangan (pola, provider)
+    pair_labels = label_idx[ctx['pair_pattern']]
+    n_providers = ctx['n_providers']
+    provider_high = np.zeros((n_providers, len(weights)))
+    provider_flag = np.zeros((n_providers, len(weights)))
+    np.add.at(provider_high, ctx['pair_provider'], (pair_labels == 0) * ctx['pair_counts'][:, None])
+    np.add.at(provider_flag, ctx['pair_provider'], (pair_labels < n_labels) * ctx['pair_counts'][:, None])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'label_counts': label_counts,
+            'agreement': agreement,
+            'high_precision': high_hit / label_counts[:, 0],
+            'high_recall': high_hit / ref_high,
+            'provider_high_rate': provider_high / ctx['provider_totals'][:, None],
+            'provider_flag_rate': provider_flag / ctx['provider_totals'][:, None],
+        }
+
+
+def _run_block(args):
+    start, weights, thresholds = args
+    return start, evaluate_block(weights, thresholds)
+
+
+# ============ BACKTEST ============
+def backtest(hits, reference, weight_grid, threshold_grid, workers=1, clip=None):
+    configs, weights, thresholds, labels = build_grid(hits, weight_grid, threshold_grid)
+    pattern_hits, inverse, pair_pattern, pair_provider, pair_counts = hits.patterns()
+
+    ctx = {
+        'pattern_hits': pattern_hits.astype(float),
+        'pattern_counts': np.bincount(inverse, minlength=len(pattern_hits)),
+        'ref_table': reference_table(hits, reference, labels),
+        'clip': hits.clip if clip is None else clip,
+        'score_scale': hits.score_scale,
+        'pair_pattern': pair_pattern,
+        'pair_provider': pair_provider,
+        'pair_counts': pair_counts,
+        'n_providers': len(hits.providers),
+        'provider_totals': np.bincount(pair_provider, weights=pair_counts,
+                                       minlength=len(hits.providers)),
+    }
+    blocks = [
+        (s, weights[s:s + BLOCK_CONFIGS], thresholds[s:s + BLOCK_CONFIGS])
+        for s in range(0, len(configs), BLOCK_CONFIGS)
+    ]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(ctx,)) as pool:
+            results = list(pool.map(_run_block, blocks))
+    else:
+        _init_worker(ctx)
+        results = [_run_block(b) for b in blocks]
+    results.sort(key=lambda r: r[0])
+
+    def stack(key):
+        return np.concatenate([r[1][key] for r in results], axis=-1 if key.startswith('provider') else 0)
+
+    summary = configs.copy()
+    label_counts = stack('label_counts')
+    for t, name in enumerate(labels + [hits.default_label]):
+        summary[f"n_{name}"] = label_counts[:, t]
+    summary['agreement'] = stack('agreement') / len(hits)
+    summary['high_precision'] = stack('high_precision')
+    summary['high_recall'] = stack('high_recall')
+
+    providers = pd.DataFrame({
+        'config_id': np.repeat(configs.index.to_numpy(), len(hits.providers)),
+        'provider_id': np.tile(hits.providers.to_numpy(), len(configs)),
+        'high_rate': stack('provider_high_rate').T.reshape(-1),
+        'flag_rate': stack('provider_flag_rate').T.reshape(-1),
+    })
+    return summary, providers
+
+
+def load_reference(paths, label_col, n_rows):
+    # default: store label fraud_label.py (training + holdout + append, patch diterapkan)
+    if paths:
+        ref = pd.concat([pd.read_csv(p, usecols=[label_col]) for p in paths], ignore_index=True)
+    else:
+        ref = label_state.read_labeled()
+    if len(ref) != n_rows:
+        raise ValueError(
+            f"Referensi {len(ref)} baris, matriks hit {n_rows} baris — urutan baris harus sama"
+        )
+    return ref[label_col].to_numpy()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest grid bobot / threshold rule fraud")
+    parser.add_argument("--hits", default=RULE_HITS_FILE)
+    parser.add_argument("--weight-grid", action="append", metavar="RULE_ID=V1,V2,...")
+    parser.add_argument("--threshold-grid", action="append", metavar="LABEL=V1,V2,...")
+    parser.add_argument(
+        "--reference", nargs="+", default=None,
+        help="CSV berlabel referensi, urutan baris sama dengan matriks hit "
+             "(default: store label dari fraud_label.py)"
+    )
+    parser.add_argument("--label-col", default="fraud_label")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    def grid(pairs):
+        return {k: [float(v) for v in vals.split(",")] for k, vals in parse_pairs(pairs, str).items()}
+
+    hits = RuleHits.load(args.hits)
+    weight_grid, threshold_grid = grid(args.weight_grid), grid(args.threshold_grid)
+    unknown = set(weight_grid) - set(hits.rule_ids)
+    if unknown:
+        raise SystemExit(f"Rule tidak dikenal: {sorted(unknown)}")
+    unknown = set(threshold_grid) - set(hits.thresholds)
+    if unknown:
+        raise SystemExit(
+            f"Label threshold tidak dikenal: {sorted(unknown)} (pilihan: {sorted(hits.thresholds)})"
+        )
+    reference = load_reference(args.reference, args.label_col, len(hits))
+
+    start = time.perf_counter()
+    summary, providers = backtest(hits, reference, weight_grid, threshold_grid, args.workers)
+    elapsed = time.perf_counter() - start
+
+    summary.to_csv(SUMMARY_FILE)
+    providers.to_csv(PROVIDER_FILE, index=False)
+    print(f"=== Backtest: {len(summary)} konfigurasi × {len(hits)} klaim "
+          f"({elapsed:.2f}s, {args.workers} worker) ===")
+    with pd.option_context('display.width', 200, 'display.max_columns', 30):
+        print(summary.sort_values('agreement', ascending=False).head(args.top))
+    print(f"✔ {SUMMARY_FILE}, {PROVIDER_FILE} saved.")
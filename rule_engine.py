@@ -0,0 +1,305 @@
+import ast
+import io
+import json
+import os
+import time
+import tokenize
+
+import numpy as np
+
+# ==========================================================
+#     RULE ENGINE (file rule deklaratif → evaluator vektor)
+# ==========================================================
+# Format file rule (JSON, field mengikuti output ai_rule_gen.py):
+# {
+#   "rules": [
+#     {"id": "...", "description": "...", "logical_condition": "<pandas query>",
+#      "weight": 20, "tier": "CRITICAL"},
+#     ...
+#   ],
+#   "clip": 100,
+#   "thresholds": {"HIGH": 66, "MEDIUM": 40},
+#   "default_label": "NORMAL"
+# }
+# Semua kondisi diparse sekali (ast + whitelist node) lalu digabung menjadi
+# satu fungsi yang mengisi matriks hit (klaim × rule, uint8) per chunk baris.
+# Tiap operasi dikompilasi menjadi panggilan ufunc dengan out= ke buffer
+# scratch sebesar satu chunk (float64 untuk aritmetika, bool untuk
+# perbandingan / logika) yang dipakai ulang untuk semua chunk dan rule →
+# tidak ada alokasi array sementara per operasi, memori tambahan hanya
+# (jumlah buffer × CHUNK_ROWS).
+
+RULE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fraud_rules.json")
+CHUNK_ROWS = 32_768   # 8 byte × 32k = 256 KB per buffer float → muat di cache L2
+TIERS = ["CRITICAL", "MAJOR", "MINOR"]
+
+_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_CMPOPS = (ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+
+# ============ PARSE ============
+def _query_to_python(condition):
+    # seperti DataFrame.query: & | ~ punya prioritas and / or / not
+    replace = {"&": "and", "|": "or", "~": "not"}
+    tokens = [
+        (tokenize.NAME, replace[tok.string]) if tok.type == tokenize.OP and tok.string in replace
+        else (tok.type, tok.string)
+        for tok in tokenize.generate_tokens(io.StringIO(condition).readline)
+    ]
+    return tokenize.untokenize(tokens)
+
+
+class _ConditionCompiler(ast.NodeTransformer):
+    # kolom → c['kolom'], and/or/not → & | ~, perbandingan berantai dipecah
+
+    def __init__(self):
+        self.columns = []
+
+    def visit_Expression(self, node):
+        return ast.Expression(self.visit(node.body))
+
+    def visit_Name(self, node):
+        if node.id not in self.columns:
+            self.columns.append(node.id)
+        return ast.Subscript(ast.Name("c", ast.Load()), ast.Constant(node.id), ast.Load())
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (bool, int, float, str)):
+            raise ValueError(f"Konstanta tidak didukung: {node.value!r}")
+        return node
+
+    def visit_BoolOp(self, node):
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        values = [self.visit(v) for v in node.values]
+        out = values[0]
+        for value in values[1:]:
+            out = ast.BinOp(out, op, value)
+        return out
+
+    def visit_UnaryOp(self, node):
+        operand = self.visit(node.operand)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(ast.Invert(), operand)
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            return ast.UnaryOp(node.op, operand)
+        raise ValueError(f"Operator tidak didukung: {type(node.op).__name__}")
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _BINOPS):
+            raise ValueError(f"Operator tidak didukung: {type(node.op).__name__}")
+        return ast.BinOp(self.visit(node.left), node.op, self.visit(node.right))
+
+    def visit_Compare(self, node):
+        operands = [self.visit(node.left)] + [self.visit(c) for c in node.comparators]
+        parts = []
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            if not isinstance(op, _CMPOPS):
+                raise ValueError(f"Perbandingan tidak didukung: {type(op).__name__}")
+            parts.append(ast.Compare(left, [op], [right]))
+        out = parts[0]
+        for part in parts[1:]:
+            out = ast.BinOp(out, ast.BitAnd(), part)
+        return out
+
+    def generic_visit(self, node):
+        raise ValueError(f"Sintaks tidak didukung di kondisi rule: {type(node).__name__}")
+
+
+def _parse_condition(condition):
+    try:
+        tree = ast.parse(_query_to_python(condition).strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Kondisi rule tidak valid: {condition!r} ({e.msg})") from None
+    compiler = _ConditionCompiler()
+    return compiler.visit(tree).body, compiler.columns
+
+
+def compile_condition(condition):
+    # → (ekspresi Python atas dict chunk `c`, kolom yang dipakai)
+    body, columns = _parse_condition(condition)
+    return ast.unparse(body), columns
+
+
+# ============ UFUNC + BUFFER ============
+_UFUNCS = {
+    ast.Add: "add", ast.Sub: "subtract", ast.Mult: "multiply", ast.Div: "true_divide",
+    ast.FloorDiv: "floor_divide", ast.Mod: "remainder", ast.Pow: "power",
+    ast.Eq: "equal", ast.NotEq: "not_equal", ast.Lt: "less", ast.LtE: "less_equal",
+    ast.Gt: "greater", ast.GtE: "greater_equal",
+    ast.BitAnd: "logical_and", ast.BitOr: "logical_or",
+    ast.Invert: "logical_not", ast.USub: "negative", ast.UAdd: "positive",
+}
+_BOOL_OPS = (ast.BitAnd, ast.BitOr)
+
+
+class _BufferEmitter:
+    # ekspresi hasil _ConditionCompiler → baris `ufunc(a, b, out=buffer)`;
+    # buffer f[i] (float64) / b[i] (bool) dialokasikan seperti register dan
+    # dilepas begitu hasilnya sudah dipakai (ufunc elementwise aman in-place).
+    # & | ~ diperlakukan sebagai operasi logika (nilai ≠ 0 → True).
+
+    def __init__(self):
+        self.lines = []
+        self.free = {"f": [], "b": []}
+        self.size = {"f": 0, "b": 0}
+
+    def _alloc(self, kind):
+        if self.free[kind]:
+            return self.free[kind].pop()
+        self.size[kind] += 1
+        return f"{kind}[{self.size[kind] - 1}]"
+
+    def _release(self, *regs):
+        for reg in regs:
+            if reg is not None:
+                self.free[reg[0]].append(reg)
+
+    def emit(self, node):
+        # → (operand, register atau None)
+        if isinstance(node, (ast.Subscript, ast.Constant)):
+            return ast.unparse(node), None
+        if isinstance(node, ast.UnaryOp):
+            args, regs = zip(self.emit(node.operand))
+            op, kind = node.op, "b" if isinstance(node.op, ast.Invert) else "f"
+        elif isinstance(node, ast.BinOp):
+            args, regs = zip(self.emit(node.left), self.emit(node.right))
+            op, kind = node.op, "b" if isinstance(node.op, _BOOL_OPS) else "f"
+        else:
+            args, regs = zip(self.emit(node.left), self.emit(node.comparators[0]))
+            op, kind = node.ops[0], "b"
+        self._release(*regs)
+        out = self._alloc(kind)
+        self.lines.append(f"{_UFUNCS[type(op)]}({', '.join(args)}, out={out})")
+        return out, out
+
+    def statement(self, body, target):
+        # kondisi berupa kolom / aritmetika (bukan perbandingan / logika) → nilai ≠ 0,
+        # supaya matriks hit tetap 0/1
+        operand, reg = self.emit(body)
+        if reg is None or reg[0] != "b":
+            self._release(reg)
+            reg = self._alloc("b")
+            self.lines.append(f"not_equal({operand}, 0, out={reg})")
+            operand = reg
+        self.lines.append(f"{target} = {operand}")
+        self._release(reg)
+
+
+# ============ RULE SET ============
+class RuleSet:
+
+    def __init__(self, rules, clip=100, thresholds=None, default_label="NORMAL", source="<rules>"):
+        if not rules:
+            raise ValueError("File rule tidak berisi rule")
+        ids = [r["id"] for r in rules]
+        if len(set(ids)) != len(ids):
+            raise ValueError("id rule harus unik")
+        for r in rules:
+            if r.get("tier", "MINOR") not in TIERS:
+                raise ValueError(f"Tier rule {r['id']} harus salah satu dari {TIERS}")
+
+        self.rules = rules
+        self.ids = ids
+        self.tiers = [r.get("tier", "MINOR") for r in rules]
+        self.weights = np.array([r["weight"] for r in rules])
+        self.clip = clip
+        self.thresholds = sorted(
+            (thresholds or {"HIGH": 66, "MEDIUM": 40}).items(), key=lambda x: -x[1]
+        )
+        self.default_label = default_label
+
+        # satu fungsi untuk semua rule: out[:, j] = kondisi_j
+        # + satu fungsi per rule (dipakai saat waktu evaluasi per rule diukur)
+        emitter, per_rule, self.columns = _BufferEmitter(), [], []
+        for j, r in enumerate(rules):
+            body, columns = _parse_condition(r["logical_condition"])
+            start = len(emitter.lines)
+            emitter.statement(body, f"out[:, {j}]")
+            rule_lines = emitter.lines[start:-1] + ["out[:] = " + emitter.lines[-1].split(" = ", 1)[1]]
+            per_rule.append("def _rule_%d(c, out, f, b):\n    %s\n" % (j, "\n    ".join(rule_lines)))
+            self.columns += [c for c in columns if c not in self.columns]
+        self._buffers = dict(emitter.size)
+        code = compile(
+            "def _evaluate(c, out, f, b):\n    " + "\n    ".join(emitter.lines) + "\n"
+            + "".join(per_rule), source, "exec"
+        )
+        namespace = {}
+        ufuncs = {name: getattr(np, name) for name in set(_UFUNCS.values())}
+        exec(code, {"__builtins__": {}, **ufuncs}, namespace)
+        self._evaluate = namespace["_evaluate"]
+        self._rule_funcs = [namespace[f"_rule_{j}"] for j in range(len(rules))]
+
+    @classmethod
+    def load(cls, path=RULE_FILE):
+        with open(path, encoding="utf-8") as f:
+            spec = json.load(f)
+        return cls(
+            spec["rules"],
+            clip=spec.get("clip", 100),
+            thresholds=spec.get("thresholds"),
+            default_label=spec.get("default_label", "NORMAL"),
+            source=path,
+        )
+
+    # ============ EVALUATE ============
+    def evaluate(self, df, extra=None, chunk_rows=CHUNK_ROWS, timings=None):
+        # matriks hit klaim × rule (uint8); extra: kolom turunan yang tidak ada di df,
+        # berupa array atau fungsi (start, end) → array chunk (dihitung per chunk)
+        # timings: array float (panjang = jumlah rule) → ditambah estimasi detik evaluasi
+        #          per rule: diukur per rule di chunk pertama saja lalu diskalakan ke n
+        #          baris; chunk lain tetap lewat _evaluate (satu pass semua rule)
+        extra = extra or {}
+        missing = [c for c in self.columns if c not in extra and c not in df.columns]
+        if missing:
+            raise KeyError(f"Kolom untuk rule tidak ditemukan: {missing}")
+        arrays = {
+            c: (extra[c] if callable(extra[c]) else np.asarray(extra[c])) if c in extra
+            else df[c].to_numpy()
+            for c in self.columns
+        }
+
+        n = len(df)
+        hits = np.empty((n, len(self.rules)), dtype=np.uint8)
+        f_buf = np.empty((self._buffers["f"], min(chunk_rows, n)), dtype=np.float64)
+        b_buf = np.empty((self._buffers["b"], min(chunk_rows, n)), dtype=bool)
+        for start in range(0, n, chunk_rows):
+            end = min(start + chunk_rows, n)
+            chunk = {c: a(start, end) if callable(a) else a[start:end] for c, a in arrays.items()}
+            f, b = list(f_buf[:, :end - start]), list(b_buf[:, :end - start])
+            if timings is None or start > 0:
+                self._evaluate(chunk, hits[start:end], f, b)
+                continue
+            sample_scale = n / (end - start)
+            for j, func in enumerate(self._rule_funcs):
+                t0 = time.perf_counter()
+                func(chunk, hits[start:end, j], f, b)
+                timings[j] += (time.perf_counter() - t0) * sample_scale
+        return hits
+
+    def score(self, hits, weights=None, chunk_rows=CHUNK_ROWS):
+        # skor mentah = hits · weights (per chunk, tanpa salinan int64 seluruh matriks)
+        weights = self.weights if weights is None else np.asarray(weights)
+        out = np.empty(len(hits), dtype=np.result_type(weights.dtype, np.int64))
+        for start in range(0, len(hits), chunk_rows):
+            out[start:start + chunk_rows] = hits[start:start + chunk_rows] @ weights
+        return out
+
+    # ============ NORMALISASI ============
+    # batch : skor / max(skor batch) × 100  → label bergantung pada klaim lain
+    # fixed : skor / konstanta kalibrasi × 100 (disimpan di label_state.pkl)
+    #         → tiap klaim bisa dilabel sendiri, hasil sama dengan batch
+    #           kalibrasi selama skor tidak melewati konstanta tersebut
+    def calibrate(self, raw):
+        return float(np.minimum(raw, self.clip).max()) if len(raw) else float(self.clip)
+
+    def normalize(self, raw, scale):
+        scores = np.minimum(raw, self.clip) / scale * 100
+        return np.minimum(np.round(scores, 2), 100.0)
+
+    def label(self, scores):
+        scores = np.asarray(scores)
+        return np.select(
+            [scores >= t for _, t in self.thresholds],
+            [name for name, _ in self.thresholds],
+            default=self.default_label,
+        ).astype(object)
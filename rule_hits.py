@@ -0,0 +1,178 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+#     RULE HIT MATRIX (klaim × rule, bitset) + WHAT-IF SCORING
+# ==========================================================
+# Disimpan fraud_label.py setiap kali labeling jalan (urutan baris = urutan
+# df saat labeling, yaitu dummy_claims_with_fraud_label.csv + new_claims_30.csv;
+# klaim dari fraud_label.py --incremental di-append di belakang).
+# Skor hanya bergantung pada pola hit, jadi klaim dikelompokkan per pola unik:
+# rescoring = (pola × rule) · bobot, lalu label per pola → per klaim / provider.
+# Biaya what-if ~ jumlah pola unik (ribuan), bukan jumlah klaim (jutaan).
+# score_scale = konstanta kalibrasi yang dipakai saat labeling (label_state.pkl);
+# tanpa score_scale skor dinormalisasi dengan skor max pola (mode batch).
+
+RULE_HITS_FILE = "rule_hits.npz"
+
+
+class RuleHits:
+
+    def __init__(self, packed, rule_ids, weights, tiers, provider_codes, providers,
+                 clip=100, thresholds=None, default_label="NORMAL", score_scale=None):
+        self.packed = packed
+        self.rule_ids = list(rule_ids)
+        self.weights = np.asarray(weights)
+        self.tiers = list(tiers)
+        self.provider_codes = np.asarray(provider_codes, dtype=np.int64)
+        self.providers = pd.Index(providers, name='provider_id')
+        self.clip = clip
+        self.thresholds = dict(thresholds or {"HIGH": 66, "MEDIUM": 40})
+        self.default_label = default_label
+        self.score_scale = score_scale
+        self._patterns = None
+
+    @classmethod
+    def from_hits(cls, hits, rules, provider_id, score_scale=None):
+        codes, providers = pd.factorize(np.asarray(provider_id), sort=True)
+        return cls(
+            np.packbits(hits, axis=1), rules.ids, rules.weights, rules.tiers, codes, providers,
+            rules.clip, dict(rules.thresholds), rules.default_label, score_scale,
+        )
+
+    def __len__(self):
+        return len(self.packed)
+
+    def hits(self):
+        return np.unpackbits(self.packed, axis=1, count=len(self.rule_ids))
+
+    # ============ UPDATE (labeling inkremental) ============
+    def update(self, rows, hits):
+        # baris lama yang pola hit-nya berubah
+        self.packed[rows] = np.packbits(hits, axis=1)
+        self._patterns = None
+
+    def append(self, hits, provider_id):
+        # klaim baru di belakang; provider baru → kode provider disusun ulang (tetap urut)
+        providers = self.providers.union(pd.Index(pd.unique(np.asarray(provider_id))))
+        self.provider_codes = np.concatenate([
+            providers.get_indexer(self.providers)[self.provider_codes],
+            providers.get_indexer(np.asarray(provider_id)),
+        ]).astype(np.int64)
+        self.providers = pd.Index(providers, name='provider_id')
+        self.packed = np.concatenate([self.packed, np.packbits(hits, axis=1)])
+        self._patterns = None
+
+    # ============ PATTERN ============
+    def patterns(self):
+        # (pola hit unik × rule, indeks pola per klaim, pasangan pola/provider + jumlah)
+        if self._patterns is None:
+            if self.packed.shape[1] <= 8:
+                # ≤ 64 rule: satu baris bitset = satu uint64 → unique 1-D (jauh lebih cepat)
+                keys = np.zeros((len(self.packed), 8), dtype=np.uint8)
+                keys[:, :self.packed.shape[1]] = self.packed
+                _, first, inverse = np.unique(
+                    keys.view(np.uint64).reshape(-1), return_index=True, return_inverse=True
+                )
+                packed_patterns = self.packed[first]
+            else:
+                packed_patterns, inverse = np.unique(self.packed, axis=0, return_inverse=True)
+            inverse = inverse.reshape(-1)
+            pattern_hits = np.unpackbits(packed_patterns, axis=1, count=len(self.rule_ids))
+
+            n_providers = max(len(self.providers), 1)
+            pairs, pair_counts = np.unique(
+                inverse * n_providers + self.provider_codes, return_counts=True
+            )
+            self._patterns = (pattern_hits, inverse, pairs // n_providers,
+                              pairs % n_providers, pair_counts)
+        return self._patterns
+
+    def weight_vector(self, weights=None):
+        # weights: None, dict {rule_id: bobot} (sebagian), atau vektor lengkap
+        if weights is None:
+            return self.weights
+        if isinstance(weights, dict):
+            unknown = set(weights) - set(self.rule_ids)
+            if unknown:
+                raise KeyError(f"Rule tidak dikenal: {sorted(unknown)}")
+            return np.array([weights.get(r, w) for r, w in zip(self.rule_ids, self.weights)])
+        weights = np.asarray(weights)
+        if len(weights) != len(self.rule_ids):
+            raise ValueError(f"Panjang vektor bobot harus {len(self.rule_ids)}")
+        return weights
+
+    # ============ SCORING ============
+    def pattern_scores(self, weights=None, clip=None):
+        # skor akhir per pola, normalisasi sama dengan RuleSet.normalize
+        # (clip → / score_scale × 100, maks 100; tanpa score_scale → / max pola)
+        pattern_hits = self.patterns()[0]
+        raw = pattern_hits @ self.weight_vector(weights)
+        raw = np.minimum(raw, self.clip if clip is None else clip)
+        scale = self.score_scale or raw.max()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.minimum(np.round(raw / scale * 100, 2), 100.0)
+
+    def pattern_labels(self, scores, thresholds=None):
+        thresholds = sorted((thresholds or self.thresholds).items(), key=lambda x: -x[1])
+        return np.select(
+            [scores >= t for _, t in thresholds], [name for name, _ in thresholds],
+            default=self.default_label,
+        ).astype(object)
+
+    def rescore(self, weights=None, thresholds=None, clip=None):
+        # → (fraud_score, fraud_label) per klaim
+        inverse = self.patterns()[1]
+        scores = self.pattern_scores(weights, clip)
+        return scores[inverse], self.pattern_labels(scores, thresholds)[inverse]
+
+    def provider_label_counts(self, labels_by_pattern):
+        _, _, pair_pattern, pair_provider, pair_counts = self.patterns()
+        counts = pd.DataFrame({
+            'provider_id': self.providers[pair_provider],
+            'fraud_label': labels_by_pattern[pair_pattern],
+            'n': pair_counts,
+        }).groupby(['provider_id', 'fraud_label'])['n'].sum().unstack(fill_value=0)
+        labels = [name for name, _ in sorted(self.thresholds.items(), key=lambda x: -x[1])]
+        return counts.reindex(columns=labels + [self.default_label], fill_value=0)
+
+    def what_if(self, weights=None, thresholds=None, clip=None):
+        # distribusi label baseline vs skenario, total & per provider
+        base = self.provider_label_counts(self.pattern_labels(self.pattern_scores()))
+        new = self.provider_label_counts(
+            self.pattern_labels(self.pattern_scores(weights, clip), thresholds)
+        )
+        new = new.reindex(columns=base.columns.union(new.columns, sort=False), fill_value=0)
+        base = base.reindex(columns=new.columns, fill_value=0)
+        providers = pd.concat({'base': base, 'new': new, 'delta': new - base}, axis=1)
+        summary = pd.DataFrame({'base': base.sum(), 'new': new.sum()})
+        summary['delta'] = summary['new'] - summary['base']
+        return summary, providers
+
+    # ============ PERSIST ============
+    def save(self, path=RULE_HITS_FILE):
+        np.savez_compressed(
+            path,
+            packed=self.packed,
+            rule_ids=np.array(self.rule_ids, dtype=str),
+            weights=self.weights,
+            tiers=np.array(self.tiers, dtype=str),
+            provider_codes=self.provider_codes,
+            providers=self.providers.to_numpy().astype(str),
+            meta=np.array(json.dumps({
+                'clip': self.clip, 'thresholds': self.thresholds,
+                'default_label': self.default_label, 'score_scale': self.score_scale,
+            })),
+        )
+
+    @classmethod
+    def load(cls, path=RULE_HITS_FILE):
+        z = np.load(path)
+        meta = json.loads(str(z['meta']))
+        return cls(
+            z['packed'], z['rule_ids'].tolist(), z['weights'], z['tiers'].tolist(),
+            z['provider_codes'], z['providers'], meta['clip'], meta['thresholds'],
+            meta['default_label'], meta.get('score_scale'),
+        )
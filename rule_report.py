@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+#     LAPORAN PER RULE (hit, hit rate provider / bulan, kontribusi HIGH, waktu)
+# ==========================================================
+# Ditulis fraud_label.py setiap run dari matriks hit yang sudah ada, jadi
+# biayanya hanya beberapa groupby-sum atas matriks uint8 (klaim × rule).
+# Waktu evaluasi per rule diukur di chunk pertama RuleSet.evaluate(timings=...)
+# lalu diskalakan ke jumlah klaim (estimasi; chunk lain memakai evaluator gabungan).
+#
+# Per rule:
+#   hit_count, hit_rate        : jumlah / proporsi klaim yang kena rule
+#   high_hits, high_share      : klaim HIGH yang kena rule, dan porsi bobot rule
+#                                dalam total skor mentah klaim HIGH
+#   eval_ms                    : estimasi waktu evaluasi kondisi rule
+#   by_provider, by_month      : hit rate per provider_id / bulan klaim (hanya > 0)
+# dead_rules: rule yang tidak pernah kena di run ini.
+
+RULE_REPORT_FILE = "rule_report.json"
+
+
+def group_hit_rates(hits, keys):
+    # (grup × rule) hit rate, satu groupby-sum untuk semua rule
+    codes, groups = pd.factorize(np.asarray(keys), sort=True)
+    counts = pd.DataFrame(hits).groupby(codes).sum().to_numpy()
+    totals = np.bincount(codes, minlength=len(groups))
+    return groups, counts / totals[:, None]
+
+
+def build_report(rules, hits, provider_id, claim_date, labels, eval_seconds, mode="full"):
+    n = len(hits)
+    high_label = rules.thresholds[0][0]
+    high = np.asarray(labels) == high_label
+
+    hit_count = hits.sum(axis=0, dtype=np.int64)
+    high_hits = hits[high].sum(axis=0, dtype=np.int64)
+    high_weight = high_hits * rules.weights
+    high_total = high_weight.sum()
+
+    providers, provider_rates = group_hit_rates(hits, provider_id)
+    months, month_rates = group_hit_rates(
+        hits, pd.to_datetime(claim_date).dt.to_period('M').astype(str)
+    )
+
+    def nonzero_rates(groups, rates):
+        return {str(g): round(float(r), 4) for g, r in zip(groups, rates) if r > 0}
+
+    report_rules = []
+    for j, rule_id in enumerate(rules.ids):
+        report_rules.append({
+            'id': rule_id,
+            'tier': rules.tiers[j],
+            'weight': rules.weights[j].item(),
+            'hit_count': int(hit_count[j]),
+            'hit_rate': round(float(hit_count[j] / n), 4) if n else 0.0,
+            'high_hits': int(high_hits[j]),
+            'high_share': round(float(high_weight[j] / high_total), 4) if high_total else 0.0,
+            'eval_ms': round(float(eval_seconds[j]) * 1000, 3),
+            'by_provider': nonzero_rates(providers, provider_rates[:, j]),
+            'by_month': nonzero_rates(months, month_rates[:, j]),
+        })
+
+    return {
+        'run_at': datetime.now().isoformat(timespec='seconds'),
+        'mode': mode,
+        'n_claims': n,
+        'n_high': int(high.sum()),
+        'eval_ms_total': round(float(np.sum(eval_seconds)) * 1000, 3),
+        'dead_rules': [r['id'] for r in report_rules if r['hit_count'] == 0],
+        'rules': report_rules,
+    }
+
+
+def save_report(report, path=RULE_REPORT_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, separators=(",", ":"))
+
+
+def report_summary(report):
+    # tabel ringkas untuk dicetak (tanpa rincian provider / bulan)
+    cols = ['id', 'tier', 'weight', 'hit_count', 'hit_rate', 'high_hits', 'high_share', 'eval_ms']
+    return pd.DataFrame(report['rules'])[cols].set_index('id')
@@ -0,0 +1,54 @@
+import argparse
+import time
+
+import pandas as pd
+
+from rule_hits import RuleHits, RULE_HITS_FILE
+
+# ==========================================================
+#   WHAT-IF BOBOT RULE (tanpa menjalankan ulang fraud_label.py)
+# ==========================================================
+# Contoh:
+#   python rule_whatif.py --weight biometric_missing=12
+#   python rule_whatif.py --weight nik_invalid=20 --threshold HIGH=60 --top 15
+
+
+def parse_pairs(pairs, cast=float):
+    out = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        if not value:
+            raise SystemExit(f"Format harus NAMA=NILAI: {pair}")
+        out[key] = cast(value)
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescoring rule fraud dengan bobot / threshold baru")
+    parser.add_argument("--hits", default=RULE_HITS_FILE, help="matriks hit dari fraud_label.py")
+    parser.add_argument("--weight", action="append", metavar="RULE_ID=BOBOT")
+    parser.add_argument("--threshold", action="append", metavar="LABEL=SKOR")
+    parser.add_argument("--clip", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10, help="jumlah provider dengan perubahan terbesar")
+    args = parser.parse_args()
+
+    hits = RuleHits.load(args.hits)
+    weights = parse_pairs(args.weight)
+    thresholds = parse_pairs(args.threshold)
+    if thresholds:
+        thresholds = {**hits.thresholds, **thresholds}
+
+    start = time.perf_counter()
+    summary, providers = hits.what_if(weights or None, thresholds or None, args.clip)
+    elapsed = time.perf_counter() - start
+
+    print(f"=== What-if: {len(hits)} klaim, {len(hits.patterns()[0])} pola hit unik ({elapsed * 1000:.1f} ms) ===")
+    for rule_id, w in weights.items():
+        print(f"  {rule_id}: {hits.weights[hits.rule_ids.index(rule_id)]} → {w:g}")
+    print(summary)
+
+    delta = providers['delta']
+    changed = delta.abs().sum(axis=1).sort_values(ascending=False, kind='mergesort')
+    print(f"\n=== Perubahan label per provider (top {args.top}) ===")
+    with pd.option_context('display.width', 200):
+        print(providers.loc[changed.index[:args.top]])
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# script pipeline ada di root repo (tanpa package)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import feature_engineering
+import fraud_label
+import label_state
+from rule_engine import RuleSet, RULE_FILE
+from rule_hits import RuleHits
+
+DIAGNOSES = {'J18.9': 2300000, 'E11': 3000000, 'I10': 2500000, 'K29.7': 1800000, 'M54.5': 1500000}
+
+
+def make_claims(niks, providers, start, end, n, seed):
+    rng = np.random.default_rng(seed)
+    claim_date = pd.DatetimeIndex(rng.choice(pd.date_range(start, end), size=n))
+    service_date = claim_date - pd.to_timedelta(rng.integers(0, 20, size=n), unit='D')
+    diagnosis = rng.choice(list(DIAGNOSES), size=n)
+    tarif = pd.Series(diagnosis).map(DIAGNOSES).to_numpy()
+    amount = (tarif * rng.uniform(0.4, 2.5, size=n)).astype(int)
+    df = pd.DataFrame({
+        'NIK': rng.choice(niks, size=n),
+        'NIK_valid': rng.choice([0, 1], size=n, p=[0.1, 0.9]),
+        'biometric_flag': rng.choice([0, 1], size=n, p=[0.2, 0.8]),
+        'age': rng.integers(1, 90, size=n),
+        'gender': rng.choice(['M', 'F'], size=n),
+        'provider_id': rng.choice(providers, size=n),
+        'diagnosis_code': diagnosis,
+        'procedure_code': rng.choice([72.0, 93.96, 99.04], size=n),
+        'num_diagnoses': rng.integers(1, 4, size=n),
+        'num_procedures': rng.integers(1, 4, size=n),
+        'length_of_stay': rng.integers(0, 8, size=n),
+        'total_claim_amount': amount,
+        'service_date': service_date.strftime('%Y-%m-%d'),
+        'claim_date': claim_date.strftime('%Y-%m-%d'),
+        'verification_method': rng.choice(['auto', 'manual'], size=n),
+        'tarif_standar_diagnosis': tarif,
+        'diagnosis_cost_ratio': amount / tarif,
+    })
+    return df.sort_values('claim_date', kind='stable').reset_index(drop=True)
+
+
+def run_batch(path):
+    feature_engineering.run_incremental(path)
+    rules = RuleSet.load(RULE_FILE)
+    df = fraud_label.load_features(feature_engineering.FEATURE_FILE, rules)
+    state, hits = label_state.load_state(), RuleHits.load()
+    ok, reason = fraud_label.can_label_incremental(df, rules, state, hits)
+    assert ok, reason
+    return fraud_label.label_incremental(df, rules, state, hits)
+
+
+def test_disjoint_batch_produces_no_patches(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    niks = [f"{3170000000000000 + i}" for i in range(60)]
+    providers = [f"RS00{i}" for i in range(1, 6)]
+    make_claims(niks, providers, '2024-01-01', '2024-06-30', 400, 0).to_csv(
+        feature_engineering.RAW_FILE, index=False
+    )
+    feature_engineering.run_full().to_csv(feature_engineering.FEATURE_FILE, index=False)
+    rules = RuleSet.load(RULE_FILE)
+    df = fraud_label.load_features(feature_engineering.FEATURE_FILE, rules)
+    fraud_label.label_full(df, rules, "batch", {})
+
+    # batch 1: NIK & provider lama → sebagian klaim lama boleh di-patch
+    make_claims(niks, providers, '2024-07-01', '2024-07-31', 80, 1).to_csv('batch1.csv', index=False)
+    run_batch('batch1.csv')
+    patch_file = label_state.LABEL_PATCH_FILE
+    before = open(patch_file).read() if os.path.exists(patch_file) else None
+
+    # batch 2: NIK & provider baru semua → tidak ada klaim lama yang berubah
+    new_niks = [f"{3270000000000000 + i}" for i in range(20)]
+    make_claims(new_niks, ['RS901', 'RS902'], '2024-08-01', '2024-08-31', 60, 2).to_csv(
+        'batch2.csv', index=False
+    )
+    appended, patches = run_batch('batch2.csv')
+
+    assert len(appended) == 60
+    assert len(patches) == 0
+    after = open(patch_file).read() if os.path.exists(patch_file) else None
+    assert after == before
+    assert len(RuleHits.load()) == 400 + 80 + 60
+    assert len(label_state.read_labeled()) == 400 + 80 + 60